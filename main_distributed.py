@@ -6,10 +6,11 @@ from tqdm import tqdm
 class NetworkClient:
     def __init__(self, network_url: str):
         self.network_url = network_url
+        self.session = requests.Session()  # Reuses the coordinator connection between calls
     
     def register_node(self, node_id: str, node_url: str):
         """Register a node with the network"""
-        response = requests.post(
+        response = self.session.post(
             f"{self.network_url}/node/register",
             json={"node_id": node_id, "url": node_url}
         )
@@ -17,7 +18,7 @@ class NetworkClient:
     
     def connect_nodes(self, node1_id: str, node2_id: str, bandwidth: int):
         """Create connection between two nodes"""
-        response = requests.post(
+        response = self.session.post(
             f"{self.network_url}/connection/create",
             json={
                 "node1_id": node1_id,
@@ -30,7 +31,7 @@ class NetworkClient:
     def initiate_transfer(self, source_node_id: str, target_node_id: str, 
                          file_name: str, file_size: int):
         """Initiate a file transfer"""
-        response = requests.post(
+        response = self.session.post(
             f"{self.network_url}/transfer/initiate",
             json={
                 "source_node_id": source_node_id,
@@ -43,7 +44,7 @@ class NetworkClient:
     
     def process_transfer(self, file_id: str, chunks_to_process: int = 1):
         """Process chunks of a transfer"""
-        response = requests.post(
+        response = self.session.post(
             f"{self.network_url}/transfer/process",
             json={
                 "file_id": file_id,
@@ -54,22 +55,22 @@ class NetworkClient:
     
     def get_transfer_status(self, file_id: str):
         """Get transfer status"""
-        response = requests.get(f"{self.network_url}/transfer/status/{file_id}")
+        response = self.session.get(f"{self.network_url}/transfer/status/{file_id}")
         return response.json()
     
     def get_network_stats(self):
         """Get network statistics"""
-        response = requests.get(f"{self.network_url}/stats")
+        response = self.session.get(f"{self.network_url}/stats")
         return response.json()
     
     def list_nodes(self):
         """List all nodes"""
-        response = requests.get(f"{self.network_url}/node/list")
+        response = self.session.get(f"{self.network_url}/node/list")
         return response.json()
     
     def tick(self):
         """Reset network utilization"""
-        response = requests.post(f"{self.network_url}/tick")
+        response = self.session.post(f"{self.network_url}/tick")
         return response.json()
 
 
@@ -189,8 +190,8 @@ def main():
         print("\nNode Details:")
         for node_id, node_url in [("node1", args.node1_url), ("node2", args.node2_url)]:
             try:
-                storage = requests.get(f"{node_url}/stats/storage").json()
-                perf = requests.get(f"{node_url}/stats/performance").json()
+                storage = client.session.get(f"{node_url}/stats/storage").json()
+                perf = client.session.get(f"{node_url}/stats/performance").json()
                 print(f"\n  {node_id}:")
                 print(f"    Storage:  {storage['used_bytes'] / (1024**3):.2f}GB / "
                       f"{storage['total_bytes'] / (1024**3):.2f}GB "
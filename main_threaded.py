@@ -3,13 +3,12 @@
 Enhanced Distributed Storage Network Client
 """
 
-import socket
-import json
 import time
 import argparse
 import os
 import sys
 from typing import Dict, List
+from threaded_protocol import enable_msgpack, connect, encode_message, recv_message
 
 class EnhancedNetworkClient:
     """Enhanced client for distributed storage network"""
@@ -17,28 +16,50 @@ class EnhancedNetworkClient:
     def __init__(self, host='localhost', port=5500):
         self.host = host
         self.port = port
+        self._sock = None  # Persistent connection to the controller
         
     def _send_request(self, command: str, args: dict = None) -> dict:
         """Send request to network controller"""
-        if args is None:
-            args = {}
-            
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(30)
-            sock.connect((self.host, self.port))
-            
-            request = {"command": command, "args": args}
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            
-            data = sock.recv(65536)  # Larger buffer for detailed responses
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
-            return response
-            
-        except Exception as e:
-            return {"success": False, "error": f"Network error: {str(e)}"}
+        return self._send_requests([(command, args)])[0]
+    
+    def _send_requests(self, requests: List[tuple]) -> List[dict]:
+        """Send several (command, args) requests back to back and collect the responses in order
+
+        All frames go out in one write on the persistent connection, so a
+        batch of requests costs a single round trip.
+        """
+        frames = b''.join(
+            encode_message({"command": command, "args": args or {}})
+            for command, args in requests
+        )
+        while True:
+            reused = self._sock is not None
+            try:
+                if not reused:
+                    self._sock = connect((self.host, self.port), timeout=30)
+                self._sock.sendall(frames)
+                responses = []
+                for _ in requests:
+                    response = recv_message(self._sock)
+                    if response is None:
+                        raise ConnectionResetError("controller closed the connection")
+                    responses.append(response)
+                return responses
+                
+            except Exception as e:
+                self.close()
+                if reused and isinstance(e, (BrokenPipeError, ConnectionResetError, ConnectionAbortedError)):
+                    continue  # Stale connection; reconnect once
+                return [{"success": False, "error": f"Network error: {str(e)}"}] * len(requests)
+    
+    def close(self):
+        """Close the connection to the controller"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
     
     def list_nodes(self) -> dict:
         """List all nodes"""
@@ -93,6 +114,16 @@ class EnhancedNetworkClient:
             "node_id": node_id
         })
     
+    def network_overview(self) -> tuple:
+        """Get network statistics and the node list in one round trip"""
+        stats, nodes = self._send_requests([("network_stats", None), ("list_nodes", None)])
+        return stats, nodes
+    
+    def node_stats_many(self, node_ids: List[str]) -> Dict[str, dict]:
+        """Get statistics for several nodes in one round trip"""
+        responses = self._send_requests([("node_stats", {"node_id": node_id}) for node_id in node_ids])
+        return dict(zip(node_ids, responses))
+    
     def set_node_online(self, node_id: str) -> dict:
         """Set node online"""
         return self._send_request("set_node_online", {
@@ -111,13 +142,12 @@ class EnhancedNetworkClient:
 
 def display_network_status(client: EnhancedNetworkClient):
     """Display beautiful network status"""
-    stats = client.network_stats()
+    stats, nodes = client.network_overview()
     if not stats.get('success'):
         # Show detailed error returned by the client for easier debugging
         print(f"❌ Failed to get network status: {stats.get('error', 'Unknown error')}")
         return
     
-    nodes = client.list_nodes()
     if not nodes.get('success'):
         print("❌ Failed to get nodes list")
         return
@@ -127,9 +157,10 @@ def display_network_status(client: EnhancedNetworkClient):
     print(f"{'Node ID':<12} {'Status':<8} {'CPU':<4} {'RAM':<6} {'Storage':<18} {'BW':<8} {'Files':<6}")
     print("-" * 90)
     
+    node_stats = client.node_stats_many(list(nodes['nodes']))
     for node_id, info in nodes['nodes'].items():
         status_icon = "🟢" if info['status'] == "online" else "🔴"
-        node_stat = client.node_stats(node_id)
+        node_stat = node_stats[node_id]
         if node_stat['success']:
             storage_used = node_stat['used_storage_gb']
             storage_percent = (storage_used / info['storage']) * 100 if info['storage'] > 0 else 0
@@ -347,9 +378,13 @@ def main():
     parser.add_argument('--host', default='localhost', help='Network controller host')
     parser.add_argument('--port', type=int, default=5000, help='Network controller port')
     parser.add_argument('--interactive', action='store_true', help='Start interactive mode')
+    parser.add_argument('--msgpack', action='store_true', help='Send RPCs as MessagePack (requires msgspec on every peer)')
     
     args = parser.parse_args()
     
+    if args.msgpack and not enable_msgpack():
+        print("⚠️  msgspec is not installed; sending RPCs as JSON")
+    
     if args.interactive:
         interactive_menu()
     else:
@@ -1,4 +1,5 @@
 from flask import Flask, request, jsonify
+from orjson_provider import use_orjson
 import requests
 import hashlib
 import time
@@ -7,6 +8,10 @@ from typing import Dict, Optional
 import argparse
 
 app = Flask(__name__)
+use_orjson(app)
+
+# Keep-alive HTTP connections to the nodes, reused across requests
+session = requests.Session()
 
 # Network state
 nodes: Dict[str, str] = {}  # node_id -> url
@@ -30,7 +35,7 @@ def register_node():
     
     # Verify node is reachable
     try:
-        response = requests.get(f"{url}/health", timeout=5)
+        response = session.get(f"{url}/health", timeout=5)
         if response.status_code != 200:
             return jsonify({"error": "Node not reachable"}), 503
     except Exception as e:
@@ -45,7 +50,7 @@ def list_nodes():
     node_info = {}
     for node_id, url in nodes.items():
         try:
-            response = requests.get(f"{url}/info", timeout=5)
+            response = session.get(f"{url}/info", timeout=5)
             if response.status_code == 200:
                 node_info[node_id] = response.json()
         except:
@@ -70,14 +75,14 @@ def create_connection():
     # Add connection to both nodes
     try:
         # Connect node1 to node2
-        requests.post(
+        session.post(
             f"{nodes[node1_id]}/connection",
             json={"node_id": node2_id, "bandwidth": bandwidth},
             timeout=5
         )
         
         # Connect node2 to node1
-        requests.post(
+        session.post(
             f"{nodes[node2_id]}/connection",
             json={"node_id": node1_id, "bandwidth": bandwidth},
             timeout=5
@@ -111,11 +116,11 @@ def initiate_transfer():
         return jsonify({"error": "One or both nodes not registered"}), 404
     
     # Generate unique file ID
-    file_id = hashlib.md5(f"{file_name}-{time.time()}".encode()).hexdigest()
+    file_id = hashlib.blake2b(f"{file_name}-{time.time()}".encode(), digest_size=16).hexdigest()
     
     # Initiate transfer on target node
     try:
-        response = requests.post(
+        response = session.post(
             f"{nodes[target_node_id]}/transfer/initiate",
             json={
                 "file_id": file_id,
@@ -167,38 +172,35 @@ def process_transfer():
     target_url = nodes[transfer['target_node_id']]
     chunks_processed = 0
     
-    # Process chunks
-    for chunk_id in range(transfer['completed_chunks'], 
-                          min(transfer['completed_chunks'] + chunks_to_process, 
-                              transfer['total_chunks'])):
+    # Send the whole batch to the target node in one request
+    chunk_ids = list(range(transfer['completed_chunks'],
+                           min(transfer['completed_chunks'] + chunks_to_process,
+                               transfer['total_chunks'])))
+    if chunk_ids:
         try:
-            response = requests.post(
-                f"{target_url}/transfer/chunk",
+            response = session.post(
+                f"{target_url}/transfer/chunks",
                 json={
                     "file_id": file_id,
-                    "chunk_id": chunk_id,
+                    "chunk_ids": chunk_ids,
                     "source_node": transfer['source_node_id']
                 },
-                timeout=30
+                timeout=30 * len(chunk_ids)
             )
+            result = response.json()
+            chunks_processed = result.get('processed_chunks', 0)
+            transfer['completed_chunks'] += chunks_processed
             
-            if response.status_code == 200:
-                result = response.json()
-                chunks_processed += 1
-                transfer['completed_chunks'] += 1
-                
-                if result.get('completed'):
-                    transfer['status'] = 'completed'
-                    transfer['completed_at'] = time.time()
-                    break
-            else:
+            if response.status_code != 200:
                 transfer['status'] = 'failed'
-                break
+            elif result.get('completed'):
+                transfer['status'] = 'completed'
+                transfer['completed_at'] = time.time()
                 
         except Exception as e:
             transfer['status'] = 'failed'
             return jsonify({
-                "error": f"Failed to process chunk {chunk_id}: {str(e)}"
+                "error": f"Failed to process chunks {chunk_ids[0]}-{chunk_ids[-1]}: {str(e)}"
             }), 500
     
     return jsonify({
@@ -239,13 +241,13 @@ def get_network_stats():
     
     for node_id, url in nodes.items():
         try:
-            storage_resp = requests.get(f"{url}/stats/storage", timeout=5)
+            storage_resp = session.get(f"{url}/stats/storage", timeout=5)
             if storage_resp.status_code == 200:
                 storage_data = storage_resp.json()
                 total_storage += storage_data['total_bytes']
                 used_storage += storage_data['used_bytes']
             
-            network_resp = requests.get(f"{url}/stats/network", timeout=5)
+            network_resp = session.get(f"{url}/stats/network", timeout=5)
             if network_resp.status_code == 200:
                 network_data = network_resp.json()
                 total_bandwidth += network_data['max_bandwidth_bps']
@@ -267,7 +269,7 @@ def tick():
     """Reset network utilization on all nodes"""
     for node_id, url in nodes.items():
         try:
-            requests.post(f"{url}/tick", timeout=5)
+            session.post(f"{url}/tick", timeout=5)
         except:
             pass
     
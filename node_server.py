@@ -1,30 +1,45 @@
 from flask import Flask, request, jsonify
+from orjson_provider import use_orjson
 from storage_virtual_node import StorageVirtualNode, TransferStatus
 import argparse
+import threading
 
 app = Flask(__name__)
+use_orjson(app)
 node = None
+health_body = None  # Encoded /health payload; it never changes once the node exists
+info_body = None  # Encoded /info payload, cleared when a connection is added
+info_lock = threading.Lock()  # Keeps a rebuild from caching connections it raced past
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "node_id": node.node_id})
+    global health_body
+    if health_body is None:
+        health_body = app.json.dumps({"status": "healthy", "node_id": node.node_id})
+    return app.response_class(health_body, mimetype=app.json.mimetype)
 
 @app.route('/info', methods=['GET'])
 def get_info():
     """Get node information"""
-    return jsonify({
-        "node_id": node.node_id,
-        "cpu_capacity": node.cpu_capacity,
-        "memory_capacity": node.memory_capacity,
-        "total_storage": node.total_storage,
-        "bandwidth": node.bandwidth,
-        "connections": list(node.connections.keys())
-    })
+    global info_body
+    with info_lock:
+        if info_body is None:
+            info_body = app.json.dumps({
+                "node_id": node.node_id,
+                "cpu_capacity": node.cpu_capacity,
+                "memory_capacity": node.memory_capacity,
+                "total_storage": node.total_storage,
+                "bandwidth": node.bandwidth,
+                "connections": list(node.connections.keys())
+            })
+        body = info_body
+    return app.response_class(body, mimetype=app.json.mimetype)
 
 @app.route('/connection', methods=['POST'])
 def add_connection():
     """Add connection to another node"""
+    global info_body
     data = request.json
     node_id = data.get('node_id')
     bandwidth = data.get('bandwidth')
@@ -32,7 +47,9 @@ def add_connection():
     if not node_id or not bandwidth:
         return jsonify({"error": "Missing node_id or bandwidth"}), 400
     
-    node.add_connection(node_id, bandwidth)
+    with info_lock:
+        node.add_connection(node_id, bandwidth)
+        info_body = None
     return jsonify({"success": True, "connected_to": node_id})
 
 @app.route('/transfer/initiate', methods=['POST'])
@@ -88,6 +105,40 @@ def process_chunk():
         "completed": is_complete
     })
 
+@app.route('/transfer/chunks', methods=['POST'])
+def process_chunks():
+    """Process a batch of chunk transfers in one request"""
+    data = request.json
+    file_id = data.get('file_id')
+    chunk_ids = data.get('chunk_ids')
+    source_node = data.get('source_node')
+    
+    if not all([file_id, chunk_ids, source_node]):
+        return jsonify({"error": "Missing required fields"}), 400
+    
+    # Stop at the first failure so the caller knows where to resume
+    processed = 0
+    for chunk_id in chunk_ids:
+        if not node.process_chunk_transfer(file_id, chunk_id, source_node):
+            break
+        processed += 1
+    
+    transfer = node.active_transfers.get(file_id) or node.stored_files.get(file_id)
+    is_complete = bool(transfer) and transfer.status == TransferStatus.COMPLETED
+    
+    if processed < len(chunk_ids):
+        return jsonify({
+            "error": f"Failed to process chunk {chunk_ids[processed]}",
+            "processed_chunks": processed,
+            "completed": is_complete
+        }), 500
+    
+    return jsonify({
+        "success": True,
+        "processed_chunks": processed,
+        "completed": is_complete
+    })
+
 @app.route('/transfer/status/<file_id>', methods=['GET'])
 def get_transfer_status(file_id):
     """Get status of a file transfer"""
@@ -96,7 +147,7 @@ def get_transfer_status(file_id):
     if not transfer:
         return jsonify({"error": "Transfer not found"}), 404
     
-    completed_chunks = sum(1 for c in transfer.chunks if c.status == TransferStatus.COMPLETED)
+    completed_chunks = transfer.completed_chunks
     
     return jsonify({
         "file_id": transfer.file_id,
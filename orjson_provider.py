@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+orjson-backed JSON for the Flask node and network servers.
+
+Flask encodes every jsonify() response and decodes every request.json body
+through app.json; use_orjson() swaps that provider for one built on orjson
+when it is installed, and leaves Flask's default in place otherwise.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; Flask's json-based provider is used without it
+    orjson = None
+
+# Chunk and transfer maps may be keyed by ints, which json accepts and orjson needs opting into
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes and decodes with orjson"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if self.sort_keys else ORJSON_OPTIONS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def use_orjson(app) -> bool:
+    """Install the orjson provider on a Flask app; returns False when orjson is missing"""
+    if orjson is None:
+        return False
+    app.json = ORJSONProvider(app)
+    return True
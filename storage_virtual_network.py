@@ -39,7 +39,7 @@ class StorageVirtualNetwork:
             return None
             
         # Generate unique file ID
-        file_id = hashlib.md5(f"{file_name}-{time.time()}".encode()).hexdigest()
+        file_id = hashlib.blake2b(f"{file_name}-{time.time()}".encode(), digest_size=16).hexdigest()
         
         # Request storage on target node
         target_node = self.nodes[target_node_id]
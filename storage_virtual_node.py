@@ -28,6 +28,7 @@ class FileTransfer:
     status: TransferStatus = TransferStatus.PENDING
     created_at: float = time.time()
     completed_at: Optional[float] = None
+    completed_chunks: int = 0
 
 class StorageVirtualNode:
     def __init__(
@@ -80,7 +81,7 @@ class StorageVirtualNode:
         chunks = []
         for i in range(num_chunks):
             # In a real system, we'd compute actual checksums
-            fake_checksum = hashlib.md5(f"{file_id}-{i}".encode()).hexdigest()
+            fake_checksum = hashlib.blake2b(f"{file_id}-{i}".encode(), digest_size=16).hexdigest()
             actual_chunk_size = min(chunk_size, file_size - i * chunk_size)
             chunks.append(FileChunk(
                 chunk_id=i,
@@ -126,10 +127,13 @@ class StorageVirtualNode:
         
         transfer = self.active_transfers[file_id]
         
-        try:
-            chunk = next(c for c in transfer.chunks if c.chunk_id == chunk_id)
-        except StopIteration:
+        # Chunks are generated in order, so chunk_id is also the list index;
+        # JSON bodies can carry floats or booleans, which must not index the list
+        if not isinstance(chunk_id, int) or isinstance(chunk_id, bool):
             return False
+        if not 0 <= chunk_id < len(transfer.chunks):
+            return False
+        chunk = transfer.chunks[chunk_id]
         
         # Simulate network transfer time
         chunk_size_bits = chunk.size * 8  # Convert bytes to bits
@@ -146,6 +150,8 @@ class StorageVirtualNode:
         time.sleep(transfer_time)  # Simulate transfer delay
 
         # Update chunk status
+        if chunk.status != TransferStatus.COMPLETED:
+            transfer.completed_chunks += 1
         chunk.status = TransferStatus.COMPLETED
         chunk.stored_node = self.node_id
         
@@ -155,7 +161,7 @@ class StorageVirtualNode:
         self.used_storage += chunk.size
         
         # Check if all chunks are completed
-        if all(c.status == TransferStatus.COMPLETED for c in transfer.chunks):
+        if transfer.completed_chunks == len(transfer.chunks):
             transfer.status = TransferStatus.COMPLETED
             transfer.completed_at = time.time()
             # self.used_storage += transfer.total_size
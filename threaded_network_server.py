@@ -6,14 +6,17 @@ Single communication protocol with automatic replication
 
 import socket
 import threading
-import json
 import time
-import hashlib
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Set
 from collections import defaultdict
 import argparse
 import os
+import signal
 from datetime import datetime
+from threaded_protocol import enable_msgpack, connect, listen, encode_reply, send_message, recv_message, wait_for_exit, FrameServer
+
+# Upper bound on requests handled concurrently by the controller; idle connections hold no worker
+CONTROLLER_MAX_WORKERS = 64
 
 class EnhancedNetworkController:
     """Enhanced network coordinator with replication and monitoring"""
@@ -29,6 +32,9 @@ class EnhancedNetworkController:
         # File management
         self.files: Dict[str, dict] = {}  # file_id -> file_info
         self.file_replicas: Dict[str, List[str]] = defaultdict(list)  # file_id -> [node_ids]
+        self.file_ids_by_name: Dict[str, List[str]] = defaultdict(list)  # file_name -> [file_ids]
+        self.node_files: Dict[str, Set[str]] = defaultdict(set)  # node_id -> {file_ids}
+        self.node_used_bytes: Dict[str, int] = defaultdict(int)  # node_id -> bytes held in replicas
         
         # Network topology
         self.connections: Dict[str, Dict[str, int]] = defaultdict(dict)
@@ -43,14 +49,37 @@ class EnhancedNetworkController:
         
         self.running = False
         self.server_socket = None
+        self.listen_sockets = []  # Opened by start
         self.lock = threading.RLock()
+        self._server = FrameServer(self._respond, CONTROLLER_MAX_WORKERS, "controller")
+        
+        # Command dispatch table: command name -> handler(args)
+        self.command_handlers = {
+            "register_node": self._register_node,
+            "unregister_node": self._unregister_node,
+            "node_status": self._update_node_status,
+            "list_nodes": lambda args: self._list_nodes(),
+            "create_file": self._create_file_actual,
+            "delete_file": self._delete_file_actual,
+            "list_files": self._list_files,
+            "transfer_file": self._transfer_file_actual,
+            "download_file": self._download_file_actual,
+            "network_stats": lambda args: self._get_network_stats(),
+            "node_stats": self._get_node_stats,
+            "set_node_online": self._set_node_online,
+            "set_node_offline": self._set_node_offline,
+            "register_file": self._register_file,
+            "unregister_file": self._unregister_file,
+            "replicate_file": self._replicate_file,
+            "display_status": lambda args: self._display_status_on_demand(),
+            "batch": self._process_batch
+        }
         
     def start(self):
         """Start the enhanced network controller"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(10)
+        # A single plain listener, so a second controller on this port fails with EADDRINUSE
+        self.listen_sockets = [listen((self.host, self.port), 10)]
+        self.server_socket = self.listen_sockets[0]
         self.running = True
         
         print("🚀 ENHANCED DISTRIBUTED CLOUD STORAGE CONTROLLER")
@@ -66,8 +95,7 @@ class EnhancedNetworkController:
         print(f"🌐 Clean Controller started on {self.host}:{self.port}")
         
         # Start connection handler
-        accept_thread = threading.Thread(target=self._accept_connections, daemon=True)
-        accept_thread.start()
+        self._server.start(self.listen_sockets)
         
         # Start health monitoring (but don't display status continuously)
         monitor_thread = threading.Thread(target=self._health_monitoring_loop, daemon=True)
@@ -76,87 +104,33 @@ class EnhancedNetworkController:
     def stop(self):
         """Stop the controller"""
         self.running = False
-        if self.server_socket:
-            self.server_socket.close()
+        self._server.stop()
         print("\n🛑 Controller stopped")
         
-    def _accept_connections(self):
-        """Accept incoming connections"""
-        while self.running:
-            try:
-                client_socket, address = self.server_socket.accept()
-                client_thread = threading.Thread(
-                    target=self._handle_client,
-                    args=(client_socket, address),
-                    daemon=True
-                )
-                client_thread.start()
-            except:
-                break
-                
-    def _handle_client(self, client_socket, address):
-        """Handle client communication"""
-        try:
-            while True:
-                data = client_socket.recv(8192)
-                if not data:
-                    break
-                    
-                request = json.loads(data.decode('utf-8'))
-                command = request.get('command')
-                args = request.get('args', {})
-                
-                response = self._process_command(command, args)
-                client_socket.sendall(json.dumps(response).encode('utf-8'))
-                
-        except Exception as e:
-            print(f"❌ Client handling error: {e}")
-        finally:
-            client_socket.close()
+    def _respond(self, request: dict, reply_flags: int) -> bytes:
+        """Handle one client request and return the encoded reply"""
+        response = self._process_command(request.get('command'), request.get('args', {}))
+        return encode_reply(response, reply_flags)
             
     def _process_command(self, command: str, args: dict) -> dict:
         """Process all commands with enhanced functionality"""
+        handler = self.command_handlers.get(command)
+        if handler is None:
+            return {"success": False, "error": f"Unknown command: {command}"}
+        
         try:
-            if command == "register_node":
-                return self._register_node(args)
-            elif command == "unregister_node":
-                return self._unregister_node(args)
-            elif command == "node_status":
-                return self._update_node_status(args)
-            elif command == "list_nodes":
-                return self._list_nodes()
-            elif command == "create_file":
-                return self._create_file_actual(args)
-            elif command == "delete_file":
-                return self._delete_file_actual(args)
-            elif command == "list_files":
-                return self._list_files(args)
-            elif command == "transfer_file":
-                return self._transfer_file_actual(args)
-            elif command == "download_file":
-                return self._download_file_actual(args)
-            elif command == "network_stats":
-                return self._get_network_stats()
-            elif command == "node_stats":
-                return self._get_node_stats(args)
-            elif command == "set_node_online":
-                return self._set_node_online(args)
-            elif command == "set_node_offline":
-                return self._set_node_offline(args)
-            elif command == "register_file":
-                return self._register_file(args)
-            elif command == "unregister_file":
-                return self._unregister_file(args)
-            elif command == "replicate_file":
-                return self._replicate_file(args)
-            elif command == "display_status":
-                return self._display_status_on_demand()
-            else:
-                return {"success": False, "error": f"Unknown command: {command}"}
-                
+            return handler(args)
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _process_batch(self, args: dict) -> dict:
+        """Process a batch of coalesced node notifications in order"""
+        results = [
+            self._process_command(event.get('command'), event.get('args', {}))
+            for event in args['events']
+        ]
+        return {"success": True, "results": results}
+    
     def _register_node(self, args: dict) -> dict:
         """Register a new storage node"""
         node_id = args['node_id']
@@ -177,6 +151,7 @@ class EnhancedNetworkController:
         """Unregister a node"""
         node_id = args['node_id']
         
+        orphaned = []
         with self.lock:
             if node_id in self.nodes:
                 del self.nodes[node_id]
@@ -184,12 +159,14 @@ class EnhancedNetworkController:
                     del self.node_status[node_id]
                 
                 # Remove file replicas from this node
-                for file_id, replicas in list(self.file_replicas.items()):
-                    if node_id in replicas:
-                        replicas.remove(node_id)
-                        if not replicas and file_id in self.files:
-                            # No replicas left, schedule re-replication
-                            self._schedule_re_replication(file_id)
+                for file_id in list(self.node_files.get(node_id, ())):
+                    self._remove_replica(file_id, node_id)
+                    if not self.file_replicas.get(file_id) and file_id in self.files:
+                        orphaned.append(file_id)
+        
+        # No replicas left, schedule re-replication (it logs, so not under the lock)
+        for file_id in orphaned:
+            self._schedule_re_replication(file_id)
         
         print(f"🔴 {node_id} disconnected")
         
@@ -203,15 +180,15 @@ class EnhancedNetworkController:
         status = args['status']
         
         with self.lock:
-            if node_id in self.node_status:
-                old_status = self.node_status[node_id]
+            old_status = self.node_status.get(node_id)
+            if old_status is not None:
                 self.node_status[node_id] = status
-                
-                # Only show status if status actually changed
-                if old_status != status:
-                    status_icon = "🟢" if status == "online" else "🔴"
-                    print(f"{status_icon} {node_id} is now {status.upper()}")
-                    self._display_minimal_status()
+        
+        # Only show status if status actually changed; printed after releasing the lock
+        if old_status is not None and old_status != status:
+            status_icon = "🟢" if status == "online" else "🔴"
+            print(f"{status_icon} {node_id} is now {status.upper()}")
+            self._display_minimal_status()
         
         return {"success": True}
     
@@ -223,7 +200,7 @@ class EnhancedNetworkController:
                 nodes_info[node_id] = {
                     **info,
                     "status": self.node_status.get(node_id, "unknown"),
-                    "files_count": len([f for f in self.file_replicas.values() if node_id in f])
+                    "files_count": len(self.node_files.get(node_id, ()))
                 }
             
             return {"success": True, "nodes": nodes_info}
@@ -245,9 +222,7 @@ class EnhancedNetworkController:
         
         try:
             # Connect to the actual node to create the file
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((node_host, node_port))
+            sock = connect((node_host, node_port), timeout=10)
             
             request = {
                 "command": "create_file",
@@ -257,26 +232,22 @@ class EnhancedNetworkController:
                 }
             }
             
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(4096)
-            response = json.loads(data.decode('utf-8'))
+            send_message(sock, request)
+            response = recv_message(sock)
             
             sock.close()
             
             if response.get('success'):
                 file_id = response['file_id']
                 
-                with self.lock:
-                    self.files[file_id] = {
-                        "file_id": file_id,
-                        "file_name": file_name,
-                        "file_size": file_size,
-                        "owner_node": node_id,
-                        "created_at": time.time()
-                    }
-                    
-                    # Initial replica on owner node
-                    self.file_replicas[file_id] = [node_id]
+                # Initial replica on owner node
+                self._add_file({
+                    "file_id": file_id,
+                    "file_name": file_name,
+                    "file_size": file_size,
+                    "owner_node": node_id,
+                    "created_at": time.time()
+                }, [node_id])
                 
                 print(f"📁 {file_name} ({file_size/1024/1024:.2f} MB) created on {node_id}")
                 print(f"   📍 File ID: {file_id}")
@@ -296,61 +267,61 @@ class EnhancedNetworkController:
         """Actually delete file from all nodes"""
         file_id = args['file_id']
         
+        # Snapshot the replica addresses, then talk to the nodes without holding the lock
         with self.lock:
             if file_id not in self.files:
                 return {"success": False, "error": "File not found"}
             
-            file_info = self.files[file_id]
-            file_name = file_info['file_name']
-            replicas = self.file_replicas.get(file_id, [])
-            
-            print(f"🗑️  Deleting {file_name} from {len(replicas)} nodes...")
+            file_name = self.files[file_id]['file_name']
+            replicas = list(self.file_replicas.get(file_id, []))
+            targets = [
+                (node_id, self.nodes[node_id].get('address', 'localhost:0'))
+                for node_id in replicas
+                if node_id in self.nodes and self.node_status.get(node_id) == "online"
+            ]
+        
+        print(f"🗑️  Deleting {file_name} from {len(replicas)} nodes...")
+        
+        # Delete file from all replica nodes
+        deleted_count = 0
+        for node_id, address in targets:
+            node_address = address.split(':')
+            node_host = node_address[0]
+            node_port = int(node_address[1])
             
-            # Delete file from all replica nodes
-            deleted_count = 0
-            for node_id in replicas:
-                if node_id in self.nodes and self.node_status.get(node_id) == "online":
-                    node_info = self.nodes[node_id]
-                    node_address = node_info.get('address', 'localhost:0').split(':')
-                    node_host = node_address[0]
-                    node_port = int(node_address[1])
+            try:
+                # Connect to node to delete file
+                sock = connect((node_host, node_port), timeout=10)
+                
+                delete_request = {
+                    "command": "delete_file",
+                    "args": {
+                        "file_id": file_id
+                    }
+                }
+                
+                send_message(sock, delete_request)
+                delete_response = recv_message(sock)
+                
+                sock.close()
+                
+                if delete_response.get('success'):
+                    deleted_count += 1
+                    print(f"   ✅ Deleted from {node_id}")
+                else:
+                    print(f"   ❌ Failed to delete from {node_id}: {delete_response.get('error')}")
                     
-                    try:
-                        # Connect to node to delete file
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(10)
-                        sock.connect((node_host, node_port))
-                        
-                        delete_request = {
-                            "command": "delete_file",
-                            "args": {
-                                "file_id": file_id
-                            }
-                        }
-                        
-                        sock.sendall(json.dumps(delete_request).encode('utf-8'))
-                        data = sock.recv(4096)
-                        delete_response = json.loads(data.decode('utf-8'))
-                        
-                        sock.close()
-                        
-                        if delete_response.get('success'):
-                            deleted_count += 1
-                            print(f"   ✅ Deleted from {node_id}")
-                        else:
-                            print(f"   ❌ Failed to delete from {node_id}: {delete_response.get('error')}")
-                            
-                    except Exception as e:
-                        print(f"   ❌ Error connecting to {node_id}: {e}")
-            
-            # Remove from controller registry
-            del self.files[file_id]
-            if file_id in self.file_replicas:
-                del self.file_replicas[file_id]
-            
-            print(f"🗑️  {file_name} deleted from {deleted_count}/{len(replicas)} nodes")
-            self._display_minimal_status()
-            return {"success": True, "message": f"File {file_name} deleted from {deleted_count} nodes"}
+            except Exception as e:
+                print(f"   ❌ Error connecting to {node_id}: {e}")
+        
+        # Remove from controller registry, unless a concurrent delete got there first
+        with self.lock:
+            if file_id in self.files:
+                self._remove_file(file_id)
+        
+        print(f"🗑️  {file_name} deleted from {deleted_count}/{len(replicas)} nodes")
+        self._display_minimal_status()
+        return {"success": True, "message": f"File {file_name} deleted from {deleted_count} nodes"}
     
     def _transfer_file_actual(self, args: dict) -> dict:
         """Actually transfer file between nodes"""
@@ -361,11 +332,12 @@ class EnhancedNetworkController:
         # Find file
         file_id = None
         file_info = None
-        for fid, info in self.files.items():
-            if info['file_name'] == file_name and source_node in self.file_replicas.get(fid, []):
-                file_id = fid
-                file_info = info
-                break
+        with self.lock:
+            for fid in self.file_ids_by_name.get(file_name, []):
+                if source_node in self.file_replicas.get(fid, []):
+                    file_id = fid
+                    file_info = self.files[fid]
+                    break
         
         if not file_id:
             return {"success": False, "error": "File not found on source node"}
@@ -389,9 +361,7 @@ class EnhancedNetworkController:
         
         try:
             # Connect to target node to initiate download
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(30)
-            sock.connect((target_host, target_port))
+            sock = connect((target_host, target_port), timeout=30)
             
             transfer_request = {
                 "command": "download_file",
@@ -404,18 +374,19 @@ class EnhancedNetworkController:
                 }
             }
             
-            sock.sendall(json.dumps(transfer_request).encode('utf-8'))
-            data = sock.recv(4096)
-            transfer_response = json.loads(data.decode('utf-8'))
+            send_message(sock, transfer_request)
+            transfer_response = recv_message(sock)
             
             sock.close()
             
             if transfer_response.get('success'):
                 # Add target node as replica
                 with self.lock:
-                    if target_node not in self.file_replicas[file_id]:
-                        self.file_replicas[file_id].append(target_node)
-                        print(f"✅ Added {target_node} as replica for {file_name}")
+                    added = file_id in self.files and target_node not in self.file_replicas[file_id]
+                    if added:
+                        self._add_replica(file_id, target_node)
+                if added:
+                    print(f"✅ Added {target_node} as replica for {file_name}")
                 
                 print(f"✅ {target_node} successfully downloaded {file_name} from {source_node}")
                 self._display_minimal_status()
@@ -441,16 +412,17 @@ class EnhancedNetworkController:
     
     def _schedule_replication(self, file_id: str):
         """Schedule file replication to other nodes"""
-        file_info = self.files[file_id]
-        current_replicas = self.file_replicas[file_id]
-        
-        # Find suitable nodes for replication (excluding current replicas)
-        suitable_nodes = []
-        for node_id, node_info in self.nodes.items():
-            if (node_id not in current_replicas and 
-                self.node_status.get(node_id) == "online" and
-                self._get_node_available_storage(node_id) >= file_info['file_size']):
-                suitable_nodes.append((node_id, node_info))
+        with self.lock:
+            file_info = self.files[file_id]
+            current_replicas = self.file_replicas[file_id]
+            
+            # Find suitable nodes for replication (excluding current replicas)
+            suitable_nodes = []
+            for node_id, node_info in self.nodes.items():
+                if (node_id not in current_replicas and 
+                    self.node_status.get(node_id) == "online" and
+                    self._get_node_available_storage(node_id) >= file_info['file_size']):
+                    suitable_nodes.append((node_id, node_info))
         
         # Sort by available resources (simple heuristic)
         suitable_nodes.sort(key=lambda x: x[1]['storage'] * 0.3 + x[1]['bandwidth'] * 0.7, reverse=True)
@@ -523,20 +495,13 @@ class EnhancedNetworkController:
             online_nodes = sum(1 for status in self.node_status.values() if status == "online")
             
             total_storage = sum(node['storage'] for node in self.nodes.values())
-            used_storage = sum(
-                sum(self.files[fid]['file_size'] for fid, replicas in self.file_replicas.items() 
-                    if node_id in replicas)
-                for node_id in self.nodes.keys()
-            )
+            used_storage = sum(self.node_used_bytes.get(node_id, 0) for node_id in self.nodes)
             
             total_files = len(self.files)
             well_replicated = sum(1 for replicas in self.file_replicas.values() if len(replicas) >= 2)
             
             # Calculate load balance
-            node_loads = []
-            for node_id in self.nodes:
-                load = len([fid for fid, replicas in self.file_replicas.items() if node_id in replicas])
-                node_loads.append(load)
+            node_loads = [len(self.node_files.get(node_id, ())) for node_id in self.nodes]
             
             avg_load = sum(node_loads) / len(node_loads) if node_loads else 0
             max_load = max(node_loads) if node_loads else 0
@@ -569,16 +534,14 @@ class EnhancedNetworkController:
             if node_id not in self.nodes:
                 return {"success": False, "error": "Node not found"}
             
-            node_files = [fid for fid, replicas in self.file_replicas.items() if node_id in replicas]
-            used_storage = sum(self.files[fid]['file_size'] for fid in node_files)
-            total_storage = self.nodes[node_id]['storage'] * (1024**3)  # Convert GB to bytes
+            used_storage = self.node_used_bytes.get(node_id, 0)
             
             return {
                 "success": True,
                 "node_id": node_id,
                 "used_storage_gb": used_storage / (1024**3),
                 "total_storage_gb": self.nodes[node_id]['storage'],
-                "files_count": len(node_files),
+                "files_count": len(self.node_files.get(node_id, ())),
                 "status": self.node_status.get(node_id, "unknown")
             }
     
@@ -629,17 +592,15 @@ class EnhancedNetworkController:
                 node_host = node_address[0]
                 node_port = int(node_address[1])
                 
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                sock.connect((node_host, node_port))
+                sock = connect((node_host, node_port), timeout=5)
                 
                 request = {
                     "command": f"set_{status}",
                     "args": {}
                 }
                 
-                sock.sendall(json.dumps(request).encode('utf-8'))
-                sock.recv(1024)  # Wait for response
+                send_message(sock, request)
+                recv_message(sock)  # Wait for response
                 sock.close()
                 print(f"📢 Notified node {node_id} about status change: {status}")
                 
@@ -657,18 +618,14 @@ class EnhancedNetworkController:
         if owner_node not in self.nodes:
             return {"success": False, "error": f"Node {owner_node} not found"}
         
-        with self.lock:
-            # Register the file in network
-            self.files[file_id] = {
-                "file_id": file_id,
-                "file_name": file_name,
-                "file_size": file_size,
-                "owner_node": owner_node,
-                "created_at": time.time()
-            }
-            
-            # Register replica on owner node only
-            self.file_replicas[file_id] = [owner_node]
+        # Register the file in network, with a replica on the owner node only
+        self._add_file({
+            "file_id": file_id,
+            "file_name": file_name,
+            "file_size": file_size,
+            "owner_node": owner_node,
+            "created_at": time.time()
+        }, [owner_node])
         
         print(f"📁 {file_name} registered from {owner_node}")
         
@@ -676,6 +633,48 @@ class EnhancedNetworkController:
         
         return {"success": True, "message": f"File {file_name} registered"}
     
+    def _add_file(self, file_info: dict, replicas: List[str]):
+        """Add a file to the registry and the name index"""
+        file_id = file_info['file_id']
+        with self.lock:
+            if file_id in self.files:
+                self._remove_file(file_id)
+            self.files[file_id] = file_info
+            self.file_replicas[file_id] = []
+            for node_id in replicas:
+                self._add_replica(file_id, node_id)
+            self.file_ids_by_name[file_info['file_name']].append(file_id)
+    
+    def _remove_file(self, file_id: str):
+        """Remove a file from the registry, its replicas and the name index"""
+        with self.lock:
+            for node_id in list(self.file_replicas.get(file_id, ())):
+                self._remove_replica(file_id, node_id)
+            file_info = self.files.pop(file_id)
+            self.file_replicas.pop(file_id, None)
+            file_ids = self.file_ids_by_name.get(file_info['file_name'])
+            if file_ids and file_id in file_ids:
+                file_ids.remove(file_id)
+                if not file_ids:
+                    del self.file_ids_by_name[file_info['file_name']]
+    
+    def _add_replica(self, file_id: str, node_id: str):
+        """Record a replica of a file on a node and update the node's usage counters"""
+        with self.lock:
+            self.file_replicas[file_id].append(node_id)
+            self.node_files[node_id].add(file_id)
+            self.node_used_bytes[node_id] += self.files[file_id]['file_size']
+    
+    def _remove_replica(self, file_id: str, node_id: str):
+        """Drop a file's replica from a node and update the node's usage counters"""
+        with self.lock:
+            self.file_replicas[file_id].remove(node_id)
+            self.node_files[node_id].discard(file_id)
+            self.node_used_bytes[node_id] -= self.files[file_id]['file_size']
+            if not self.node_files[node_id]:
+                del self.node_files[node_id]
+                del self.node_used_bytes[node_id]
+    
     def _unregister_file(self, args: dict) -> dict:
         """Unregister a file that was deleted from a node"""
         file_id = args['file_id']
@@ -688,12 +687,8 @@ class EnhancedNetworkController:
             file_info = self.files[file_id]
             file_name = file_info['file_name']
             
-            # Remove file from registry
-            del self.files[file_id]
-            
-            # Remove from replicas
-            if file_id in self.file_replicas:
-                del self.file_replicas[file_id]
+            # Remove file from registry and replicas
+            self._remove_file(file_id)
         
         print(f"🗑️  {file_name} unregistered from {node_id}")
         
@@ -712,10 +707,8 @@ class EnhancedNetworkController:
     
     def _get_node_available_storage(self, node_id: str) -> float:
         """Calculate available storage for a node"""
-        node_files = [fid for fid, replicas in self.file_replicas.items() if node_id in replicas]
-        used_storage = sum(self.files[fid]['file_size'] for fid in node_files)
         total_storage = self.nodes[node_id]['storage'] * (1024**3)
-        return total_storage - used_storage
+        return total_storage - self.node_used_bytes.get(node_id, 0)
     
     def _display_minimal_status(self):
         """Display minimal status only when there are significant changes"""
@@ -860,17 +853,25 @@ def main():
     parser = argparse.ArgumentParser(description='Enhanced Distributed Cloud Storage Controller')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to (default: 0.0.0.0)')
     parser.add_argument('--port', type=int, default=5000, help='Port to bind to (default: 5000)')
+    parser.add_argument('--msgpack', action='store_true', help='Send RPCs as MessagePack (requires msgspec on every peer)')
     
     args = parser.parse_args()
     
+    if args.msgpack and not enable_msgpack():
+        print("⚠️  msgspec is not installed; sending RPCs as JSON")
+    
     controller = EnhancedNetworkController(host=args.host, port=args.port)
     
+    exit_requested = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: exit_requested.set())
+    
     try:
         controller.start()
         print(f"\n🔄 Controller running. Press Ctrl+C to stop.\n")
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
+        
+        # Sleep until Ctrl+C
+        wait_for_exit(exit_requested)
+        
         print("\n\n🛑 Shutting down controller...")
         controller.stop()
     except Exception as e:
@@ -5,21 +5,106 @@ Enhanced Storage Node with File Operations and Network Integration
 
 import socket
 import threading
-import json
 import time
 import argparse
+import atexit
 import os
 import shutil
+import signal
+import sys
+import queue
+import logging
+import logging.handlers
 from typing import Dict, Any
-import hashlib
+import secrets
+from threaded_protocol import enable_msgpack, connect, listen_group, encode_reply, REPLY_FLAGS, send_message, recv_message, wait_for_exit, FrameServer
+
+logger = logging.getLogger("storage_node")
+
+# Controller notifications raised within this window are sent as one batch
+NOTIFY_COALESCE_DELAY = 0.01  # seconds
+NOTIFY_BATCH_MAX = 32
+
+# Idle controller connections a node keeps open for reuse
+CTRL_POOL_SIZE = 4
+
+# Upper bound on requests handled concurrently by a node; idle connections hold no worker
+NODE_MAX_WORKERS = 32
+
+# Test data is written in blocks of this size rather than built in memory
+FILL_BLOCK_SIZE = 1024 * 1024
+
+# How long transfers and deletes wait for a file's background write; kept below the
+# callers' socket timeouts (controller delete 10s, transfer and download 30s) so they
+# get "File is still being written" instead of timing out themselves
+FILE_READY_TIMEOUT = 5  # seconds
+
+# Files waiting for the background writer; each holds an open file handle
+WRITE_QUEUE_SIZE = 256
+
+# A storage directory scan is reused only once the directory's mtime is this old,
+# since later changes within the same filesystem timestamp tick would go unnoticed
+SCAN_CACHE_MIN_AGE = 2  # seconds
+
+
+class _LogListener(logging.handlers.QueueListener):
+    """Queue listener that also signals flush markers once earlier records are written"""
+
+    def handle(self, record):
+        if isinstance(record, threading.Event):
+            record.set()
+        else:
+            super().handle(record)
+
+
+_log_queue = None
+_log_listener = None
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route node log records through a queue so handler threads never block on stdout
+
+    Safe to call more than once; the listener is started once and stopped at
+    exit, writing out any records still queued.
+    """
+    global _log_queue, _log_listener
+    if _log_listener is None:
+        _log_queue = queue.Queue()
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        _log_listener = _LogListener(_log_queue, stream_handler)
+        
+        logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+    return _log_listener
+
+
+def _flush_log(timeout: float = 1):
+    """Wait until the log records queued so far have been written"""
+    if _log_listener is not None:
+        written = threading.Event()
+        _log_queue.put(written)
+        written.wait(timeout)
+
+
+def _menu_input(prompt: str) -> str:
+    """Read menu input once queued output is on screen, so the prompt comes last"""
+    _flush_log()
+    return input(prompt)
 
 class EnhancedStorageNode:
     def __init__(self, node_id: str, cpu: int, memory: int, storage: int, bandwidth: int):
+        if not logger.hasHandlers():
+            setup_logging()  # Nothing configured by the importer, so INFO lines would be dropped
         self.node_id = node_id
         self.cpu = cpu
         self.memory = memory
         self.storage = storage  # GB
         self.bandwidth = bandwidth  # Mbps
+        self.total_storage_bytes = storage * (1024**3)
         
         # Create storage directory with absolute path
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,143 +116,131 @@ class EnhancedStorageNode:
         os.makedirs(self.storage_path, exist_ok=True)
         
         self.files: Dict[str, dict] = {}
-        self.running = False
+        self.file_names: Dict[str, str] = {}  # file_name -> file_id
+        self.used_storage_bytes = 0  # Sum of file_size over self.files
+        self.files_lock = threading.Lock()  # Guards files, file_names and used_storage_bytes
+        self._list_files_cache = None  # Static list_files entries, cleared on registry changes
+        self._physical_scan = None  # (directory mtime_ns, file names) from the last reusable scan
+        
+        # New file contents are written by a background thread, in order
+        self._write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)  # Full queue makes create_file wait
+        self._pending_writes: Dict[str, threading.Event] = {}  # file_id -> set when written
+        threading.Thread(target=self._write_loop, daemon=True).start()
+        self.listen_sockets = []  # Opened by start_server, one serve loop each
         self.status = "online"  # Track node status
+        self._server = FrameServer(self._respond, NODE_MAX_WORKERS, f"node-{node_id}", logger.error)
+        
+        # Responses that never change are encoded once per wire format and
+        # written straight to the socket, bypassing the dispatch table
+        health = {"status": "healthy", "node_id": node_id}
+        self._static_frames = {
+            "health": {flags: encode_reply(health, flags) for flags in REPLY_FLAGS}
+        }
+        self._node_info_base = None  # Fixed node_info fields, set once the port is known
         
-        print(f"📁 Storage directory created: {self.storage_path}")
+        # Command dispatch table: command name -> handler(args)
+        self.command_handlers = {
+            "node_info": lambda args: self._get_node_info(),
+            "create_file": self._create_file,
+            "delete_file": self._delete_file,
+            "list_files": lambda args: self._list_files(),
+            "file_info": self._file_info,
+            "storage_stats": lambda args: self._storage_stats(),
+            "transfer_chunk": self._transfer_chunk,
+            "download_file": self._download_file,
+            "transfer_file": self._transfer_file,
+            "set_online": lambda args: self.set_online(),
+            "set_offline": lambda args: self.set_offline()
+        }
+        
+        logger.info(f"📁 Storage directory created: {self.storage_path}")
 
-    def start_server(self, host='localhost', port=0):
-        """Start node server"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((host, port))
+    def start_server(self, host='localhost', port=0, listeners=1):
+        """Start node server; listeners > 1 shares the port between accept loops via SO_REUSEPORT"""
+        self.listen_sockets = listen_group((host, port), 5, listeners)
+        self.server_socket = self.listen_sockets[0]
         self.actual_port = self.server_socket.getsockname()[1]
-        self.server_socket.listen(5)
-        self.running = True
+        self._node_info_base = {
+            "success": True,
+            "node_id": self.node_id,
+            "cpu": self.cpu,
+            "memory": self.memory,
+            "storage": self.storage,
+            "bandwidth": self.bandwidth,
+            "address": f"localhost:{self.actual_port}",
+            "storage_path": self.storage_path
+        }
         
-        print(f"🖥️  Node {self.node_id} started on {host}:{self.actual_port}")
-        print(f"📁 Storage path: {self.storage_path}")
-        print(f"🟢 Node {self.node_id} is ONLINE")
+        logger.info(f"🖥️  Node {self.node_id} started on {host}:{self.actual_port}")
+        logger.info(f"📁 Storage path: {self.storage_path}")
+        logger.info(f"🟢 Node {self.node_id} is ONLINE")
         
         # Start accepting connections
-        accept_thread = threading.Thread(target=self._accept_connections, daemon=True)
-        accept_thread.start()
+        self._server.start(self.listen_sockets)
         
         return self.actual_port
         
     def stop_server(self):
         """Stop node server"""
-        self.running = False
-        if self.server_socket:
-            self.server_socket.close()
-        print(f"🛑 Node {self.node_id} stopped")
+        self._server.stop()
+        logger.info(f"🛑 Node {self.node_id} stopped")
         
     def set_online(self):
         """Set node online"""
         if self.status != "online":
             self.status = "online"
-            print(f"🎯 NODE {self.node_id} STATUS: 🟢 ONLINE")
+            logger.info(f"🎯 NODE {self.node_id} STATUS: 🟢 ONLINE")
         return {"success": True, "message": f"Node {self.node_id} is online"}
     
     def set_offline(self):
         """Set node offline"""
         if self.status != "offline":
             self.status = "offline"
-            print(f"🎯 NODE {self.node_id} STATUS: 🔴 OFFLINE")
+            logger.info(f"🎯 NODE {self.node_id} STATUS: 🔴 OFFLINE")
         return {"success": True, "message": f"Node {self.node_id} is offline"}
         
-    def _accept_connections(self):
-        """Accept incoming connections"""
-        while self.running:
-            try:
-                client_socket, address = self.server_socket.accept()
-                client_thread = threading.Thread(
-                    target=self._handle_client,
-                    args=(client_socket, address),
-                    daemon=True
-                )
-                client_thread.start()
-            except:
-                break
-                
-    def _handle_client(self, client_socket, address):
-        """Handle client requests"""
-        try:
-            data = client_socket.recv(8192)
-            if not data:
-                return
-                
-            request = json.loads(data.decode('utf-8'))
-            command = request.get('command')
-            args = request.get('args', {})
-            
-            print(f"🔧 {self.node_id} received command: {command}")
-            
-            response = self._process_command(command, args)
-            client_socket.sendall(json.dumps(response).encode('utf-8'))
-            
-            # Log the action on the node
-            if command == "create_file":
-                print(f"✅ {self.node_id} successfully created file: {args.get('file_name')}")
-            elif command == "delete_file":
-                print(f"✅ {self.node_id} successfully deleted file: {args.get('file_id')}")
-            elif command == "download_file":
-                print(f"✅ {self.node_id} successfully downloaded file: {args.get('file_name')}")
-            elif command == "set_online":
-                print(f"🎯 {self.node_id} status changed: 🟢 ONLINE")
-            elif command == "set_offline":
-                print(f"🎯 {self.node_id} status changed: 🔴 OFFLINE")
-            
-        except Exception as e:
-            print(f"❌ Node {self.node_id} client error: {e}")
-        finally:
-            client_socket.close()
+    def _respond(self, request: dict, reply_flags: int) -> bytes:
+        """Handle one client request and return the encoded reply"""
+        command = request.get('command')
+        args = request.get('args', {})
+        
+        logger.info(f"🔧 {self.node_id} received command: {command}")
+        
+        static_frames = self._static_frames.get(command)
+        if static_frames:
+            return static_frames[reply_flags]
+        
+        reply = encode_reply(self._process_command(command, args), reply_flags)
+        
+        # Log the action on the node
+        if command == "create_file":
+            logger.info(f"✅ {self.node_id} successfully created file: {args.get('file_name')}")
+        elif command == "delete_file":
+            logger.info(f"✅ {self.node_id} successfully deleted file: {args.get('file_id')}")
+        elif command == "download_file":
+            logger.info(f"✅ {self.node_id} successfully downloaded file: {args.get('file_name')}")
+        elif command == "set_online":
+            logger.info(f"🎯 {self.node_id} status changed: 🟢 ONLINE")
+        elif command == "set_offline":
+            logger.info(f"🎯 {self.node_id} status changed: 🔴 OFFLINE")
+        return reply
             
     def _process_command(self, command: str, args: dict) -> dict:
         """Process node commands"""
+        handler = self.command_handlers.get(command)
+        if handler is None:
+            return {"success": False, "error": f"Unknown command: {command}"}
+        
         try:
-            if command == "node_info":
-                return self._get_node_info()
-            elif command == "create_file":
-                return self._create_file(args)
-            elif command == "delete_file":
-                return self._delete_file(args)
-            elif command == "list_files":
-                return self._list_files()
-            elif command == "file_info":
-                return self._file_info(args)
-            elif command == "storage_stats":
-                return self._storage_stats()
-            elif command == "health":
-                return {"status": "healthy", "node_id": self.node_id}
-            elif command == "transfer_chunk":
-                return self._transfer_chunk(args)
-            elif command == "download_file":
-                return self._download_file(args)
-            elif command == "transfer_file":
-                return self._transfer_file(args)
-            elif command == "set_online":
-                return self.set_online()
-            elif command == "set_offline":
-                return self.set_offline()
-            else:
-                return {"success": False, "error": f"Unknown command: {command}"}
-                
+            return handler(args)
         except Exception as e:
             return {"success": False, "error": str(e)}
     
     def _get_node_info(self) -> dict:
         """Get node information"""
         return {
-            "success": True,
-            "node_id": self.node_id,
-            "cpu": self.cpu,
-            "memory": self.memory,
-            "storage": self.storage,
-            "bandwidth": self.bandwidth,
-            "address": f"localhost:{self.actual_port}",
+            **self._node_info_base,
             "files_count": len(self.files),
-            "storage_path": self.storage_path,
             "status": self.status
         }
     
@@ -175,7 +248,7 @@ class EnhancedStorageNode:
         """Create a file on this node"""
         file_name = args['file_name']
         file_size = args['file_size']
-        file_id = args.get('file_id', hashlib.md5(f"{file_name}-{time.time()}".encode()).hexdigest()[:8])
+        file_id = args.get('file_id') or secrets.token_hex(4)
         
         # Check storage availability
         available = self._get_available_storage()
@@ -186,49 +259,131 @@ class EnhancedStorageNode:
         file_path = os.path.join(self.storage_path, file_name)
         
         try:
-            # Create actual file with readable content
-            with open(file_path, 'w') as f:
-                # Write file metadata and some content
-                f.write(f"File: {file_name}\n")
-                f.write(f"Created: {time.ctime()}\n")
-                f.write(f"Size: {file_size} bytes\n")
-                f.write(f"Node: {self.node_id}\n")
-                f.write(f"ID: {file_id}\n")
-                f.write("-" * 40 + "\n")
-                
-                # Add some dummy content to reach the specified size
-                content_size = file_size - f.tell()
-                if content_size > 0:
-                    # Write pattern that shows this is test data
-                    pattern = f"This is test data for {file_name} stored on node {self.node_id}. "
-                    repetitions = max(1, content_size // len(pattern))
-                    f.write((pattern * repetitions)[:content_size])
-            
-            # Verify file was created and has correct size
-            actual_size = os.path.getsize(file_path)
-            if actual_size != file_size:
-                # Adjust file size if needed
-                with open(file_path, 'a') as f:
-                    f.write(' ' * (file_size - actual_size))
-        
+            # Open now so path errors are reported to the caller; the content is written in the background
+            header = self._file_header(file_name, file_size, file_id)
+            f = open(file_path, 'wb')
         except Exception as e:
             return {"success": False, "error": f"File creation failed: {str(e)}"}
         
-        # Register file
-        self.files[file_id] = {
+        # Register file right away so it is listed and counted against capacity
+        file_info = {
             "file_id": file_id,
             "file_name": file_name,
             "file_size": file_size,
             "file_path": file_path,
             "created_at": time.time(),
-            "actual_size": os.path.getsize(file_path)
+            "actual_size": 0,
+            "file_ready": False
         }
+        ready = threading.Event()
+        self._pending_writes[file_id] = ready
+        self._register_file(file_info)
+        self._write_queue.put((f, file_info, header, ready))
+        
+        logger.info(f"📁 {self.node_id} created {file_name} ({file_size/1024/1024:.2f} MB)")
+        logger.info(f"   📍 Location: {file_path}")
+        
+        return {"success": True, "file_id": file_id, "file_path": file_path, "file_ready": False}
+    
+    def _write_loop(self):
+        """Write queued file contents in order, off the request handler threads"""
+        while True:
+            f, file_info, header, ready = self._write_queue.get()
+            try:
+                with f:
+                    actual_size = self._write_file_contents(f, file_info, header)
+                with self.files_lock:
+                    file_info['actual_size'] = actual_size
+                    file_info['file_ready'] = True
+                    self._list_files_cache = None
+                logger.info(f"   📊 {file_info['file_name']} ready, actual size: {actual_size} bytes")
+            except Exception as e:
+                logger.error(f"❌ {self.node_id} failed writing {file_info['file_name']}: {e}")
+                try:
+                    os.remove(file_info['file_path'])  # Drop the partial content
+                except OSError:
+                    pass
+                # Keep the entry, still not ready, so list_files and file_info report the failure
+                with self.files_lock:
+                    file_info['write_error'] = str(e)
+                    self._list_files_cache = None
+            finally:
+                self._pending_writes.pop(file_info['file_id'], None)
+                ready.set()
+    
+    def _write_file_contents(self, f, file_info: dict, header: bytes) -> int:
+        """Fill a new file with its header and test data; returns the bytes written"""
+        file_name = file_info['file_name']
+        file_size = file_info['file_size']
+        self._preallocate(f, file_size)
+        
+        # Write file metadata and some content
+        actual_size = f.write(header)
         
-        print(f"📁 {self.node_id} created {file_name} ({file_size/1024/1024:.2f} MB)")
-        print(f"   📍 Location: {file_path}")
-        print(f"   📊 Actual size: {os.path.getsize(file_path)} bytes")
+        # Add some dummy content to reach the specified size
+        content_size = file_size - len(header)
+        if content_size > 0:
+            # Write pattern that shows this is test data
+            pattern = f"This is test data for {file_name} stored on node {self.node_id}. ".encode('utf-8')
+            repetitions = max(1, content_size // len(pattern))
+            actual_size += self._write_pattern(f, pattern, min(len(pattern) * repetitions, content_size))
         
-        return {"success": True, "file_id": file_id, "file_path": file_path}
+        # Pad with spaces if the pattern fell short of the requested size
+        if actual_size < file_size:
+            actual_size += f.write(b' ' * (file_size - actual_size))
+        return actual_size
+    
+    def _wait_for_file(self, file_id: str, timeout: float = None) -> bool:
+        """Wait until a file's background write has finished; False on timeout"""
+        ready = self._pending_writes.get(file_id)
+        return ready.wait(timeout) if ready else True
+    
+    def _register_file(self, file_info: dict):
+        """Add a file to the registry and the name index, keeping used storage in step"""
+        file_id = file_info['file_id']
+        with self.files_lock:
+            previous = self.files.get(file_id)
+            if previous:
+                self.used_storage_bytes -= previous['file_size']
+            self.files[file_id] = file_info
+            self.file_names[file_info['file_name']] = file_id
+            self.used_storage_bytes += file_info['file_size']
+            self._list_files_cache = None
+    
+    def _unregister_file(self, file_id: str):
+        """Remove a file from the registry and the name index"""
+        with self.files_lock:
+            file_info = self.files.pop(file_id, None)
+            if not file_info:
+                return  # Already removed by a concurrent delete
+            if self.file_names.get(file_info['file_name']) == file_id:
+                del self.file_names[file_info['file_name']]
+            self.used_storage_bytes -= file_info['file_size']
+            self._list_files_cache = None
+    
+    def _preallocate(self, f, size: int):
+        """Reserve disk space for a file up front where the platform supports it"""
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+            except OSError:
+                pass  # Filesystem does not support preallocation
+    
+    def _write_pattern(self, f, pattern: bytes, length: int) -> int:
+        """Write length bytes of a repeating pattern one block at a time"""
+        # Whole patterns covering min(length, FILL_BLOCK_SIZE), so small files stay small
+        repetitions = max(1, -(-min(length, FILL_BLOCK_SIZE) // len(pattern)))
+        block = memoryview(pattern * repetitions)
+        written = 0
+        while written < length:
+            written += f.write(block[:length - written])
+        return written
+    
+    def _file_header(self, file_name: str, file_size: int, file_id: str, source_node: str = None) -> bytes:
+        """Build the metadata header written at the top of every stored file"""
+        source_line = f"Source: {source_node}\n" if source_node else ""
+        return (f"File: {file_name}\nCreated: {time.ctime()}\nSize: {file_size} bytes\n"
+                f"Node: {self.node_id}\nID: {file_id}\n{source_line}{'-' * 40}\n").encode('utf-8')
     
     def _delete_file(self, args: dict) -> dict:
         """Delete a file from this node"""
@@ -237,25 +392,30 @@ class EnhancedStorageNode:
         if file_id not in self.files:
             return {"success": False, "error": "File not found on this node"}
         
-        file_info = self.files[file_id]
+        # Let a pending background write finish so it cannot recreate the file
+        if not self._wait_for_file(file_id, timeout=FILE_READY_TIMEOUT):
+            return {"success": False, "error": "File is still being written"}
+        
+        file_info = self.files.get(file_id)
+        if not file_info:
+            return {"success": False, "error": "File not found on this node"}
         file_path = file_info['file_path']
         file_name = file_info['file_name']
         
         # Delete physical file
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"🗑️  {self.node_id} deleted physical file: {file_path}")
-            else:
-                print(f"⚠️  {self.node_id}: File not found at path: {file_path}")
+            os.remove(file_path)
+            logger.info(f"🗑️  {self.node_id} deleted physical file: {file_path}")
+        except FileNotFoundError:
+            logger.warning(f"⚠️  {self.node_id}: File not found at path: {file_path}")
         except Exception as e:
-            print(f"❌ {self.node_id} error deleting file: {e}")
+            logger.error(f"❌ {self.node_id} error deleting file: {e}")
             return {"success": False, "error": f"File deletion failed: {str(e)}"}
         
         # Remove from registry
-        del self.files[file_id]
+        self._unregister_file(file_id)
         
-        print(f"🗑️  {self.node_id} removed {file_name} from registry")
+        logger.info(f"🗑️  {self.node_id} removed {file_name} from registry")
         return {"success": True, "message": f"File {file_name} deleted from {self.node_id}"}
     
     def _download_file(self, args: dict) -> dict:
@@ -266,7 +426,7 @@ class EnhancedStorageNode:
         source_host = args['source_host']
         source_port = args['source_port']
         
-        print(f"📥 {self.node_id} downloading {file_name} from {source_node}...")
+        logger.info(f"📥 {self.node_id} downloading {file_name} from {source_node}...")
         
         # Check storage availability
         available = self._get_available_storage()
@@ -275,9 +435,7 @@ class EnhancedStorageNode:
         
         try:
             # Connect to source node to get file content
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(30)
-            sock.connect((source_host, source_port))
+            sock = connect((source_host, source_port), timeout=30)
             
             # Request file transfer from source node
             transfer_request = {
@@ -288,47 +446,42 @@ class EnhancedStorageNode:
                 }
             }
             
-            sock.sendall(json.dumps(transfer_request).encode('utf-8'))
-            data = sock.recv(4096)
-            transfer_response = json.loads(data.decode('utf-8'))
+            send_message(sock, transfer_request)
+            transfer_response = recv_message(sock)
             
             sock.close()
             
             if transfer_response.get('success'):
                 # Create the file locally with the same content
                 file_path = os.path.join(self.storage_path, file_name)
-                file_id = hashlib.md5(f"{file_name}-{time.time()}".encode()).hexdigest()[:8]
+                file_id = secrets.token_hex(4)
                 
                 # Create file with the same structure as source
-                with open(file_path, 'w') as f:
-                    f.write(f"File: {file_name}\n")
-                    f.write(f"Created: {time.ctime()}\n")
-                    f.write(f"Size: {file_size} bytes\n")
-                    f.write(f"Node: {self.node_id}\n")
-                    f.write(f"ID: {file_id}\n")
-                    f.write(f"Source: {source_node}\n")
-                    f.write("-" * 40 + "\n")
+                header = self._file_header(file_name, file_size, file_id, source_node)
+                with open(file_path, 'wb') as f:
+                    self._preallocate(f, file_size)
+                    actual_size = f.write(header)
                     
                     # Add content to reach specified size
-                    content_size = file_size - f.tell()
+                    content_size = file_size - len(header)
                     if content_size > 0:
-                        pattern = f"This is downloaded data for {file_name} from {source_node} to {self.node_id}. "
+                        pattern = f"This is downloaded data for {file_name} from {source_node} to {self.node_id}. ".encode('utf-8')
                         repetitions = max(1, content_size // len(pattern))
-                        f.write((pattern * repetitions)[:content_size])
+                        actual_size += self._write_pattern(f, pattern, min(len(pattern) * repetitions, content_size))
                 
                 # Register the downloaded file
-                self.files[file_id] = {
+                self._register_file({
                     "file_id": file_id,
                     "file_name": file_name,
                     "file_size": file_size,
                     "file_path": file_path,
                     "created_at": time.time(),
-                    "actual_size": os.path.getsize(file_path),
+                    "actual_size": actual_size,
                     "source_node": source_node
-                }
+                })
                 
-                print(f"✅ {self.node_id} successfully downloaded {file_name} from {source_node}")
-                print(f"   📍 Location: {file_path}")
+                logger.info(f"✅ {self.node_id} successfully downloaded {file_name} from {source_node}")
+                logger.info(f"   📍 Location: {file_path}")
                 return {"success": True, "file_id": file_id, "file_path": file_path}
             else:
                 return {"success": False, "error": transfer_response.get('error', 'Download failed')}
@@ -342,102 +495,136 @@ class EnhancedStorageNode:
         target_node = args.get('target_node', 'unknown')
         
         # Find the file on this node
-        file_info = None
-        file_id = None
-        for fid, info in self.files.items():
-            if info['file_name'] == file_name:
-                file_info = info
-                file_id = fid
-                break
+        file_id = self.file_names.get(file_name)
+        file_info = self.files.get(file_id)
         
         if not file_info:
             return {"success": False, "error": "File not found on this node"}
         
-        print(f"📤 {self.node_id} transferring {file_name} to {target_node}...")
+        logger.info(f"📤 {self.node_id} transferring {file_name} to {target_node}...")
         
-        # Check if file exists physically
-        if not os.path.exists(file_info['file_path']):
-            return {"success": False, "error": "File not found on disk"}
+        if not self._wait_for_file(file_id, timeout=FILE_READY_TIMEOUT):
+            return {"success": False, "error": "File is still being written"}
+        if file_info.get('write_error'):
+            return {"success": False, "error": f"File write failed: {file_info['write_error']}"}
         
         try:
-            # Read file content to simulate transfer
-            with open(file_info['file_path'], 'r') as f:
-                file_content = f.read()
+            # Only the preview is sent back, so read just enough bytes for it
+            with open(file_info['file_path'], 'rb') as f:
+                head = f.read(101)
+            preview = head[:100].decode('utf-8', errors='replace')
             
             # Simulate transfer time based on file size and bandwidth
             transfer_time = file_info['file_size'] / (self.bandwidth * 1000000)  # Convert Mbps to bytes/sec
             if transfer_time > 0.1:  # Cap simulation time
                 transfer_time = 0.1
             
-            print(f"   ⏳ Transfer simulation: {file_info['file_size']/1024/1024:.2f} MB, ~{transfer_time:.2f}s")
+            logger.info(f"   ⏳ Transfer simulation: {file_info['file_size']/1024/1024:.2f} MB, ~{transfer_time:.2f}s")
             time.sleep(transfer_time)
             
-            print(f"✅ {self.node_id} successfully transferred {file_name} to {target_node}")
+            logger.info(f"✅ {self.node_id} successfully transferred {file_name} to {target_node}")
             return {
                 "success": True, 
                 "message": f"File {file_name} transferred successfully",
                 "file_size": file_info['file_size'],
-                "file_content_preview": file_content[:100] + "..." if len(file_content) > 100 else file_content
+                "file_content_preview": preview + "..." if len(head) > 100 else preview
             }
             
+        except FileNotFoundError:
+            return {"success": False, "error": "File not found on disk"}
         except Exception as e:
             return {"success": False, "error": f"Transfer failed: {str(e)}"}
     
     def _list_files(self) -> dict:
         """List all files on this node"""
         # Also check physical files in storage directory
-        physical_files = []
-        if os.path.exists(self.storage_path):
-            physical_files = [f for f in os.listdir(self.storage_path) 
-                            if os.path.isfile(os.path.join(self.storage_path, f))]
+        physical_names = self._physical_file_names()
         
-        files_list = []
-        for file_id, file_info in self.files.items():
-            file_exists = os.path.exists(file_info['file_path'])
-            files_list.append({
-                "file_id": file_id,
-                "file_name": file_info['file_name'],
-                "file_size": file_info['file_size'],
-                "actual_size": file_info.get('actual_size', 0),
-                "created_at": file_info['created_at'],
-                "file_path": file_info['file_path'],
-                "physical_file_exists": file_exists
-            })
+        entries = self._list_files_cache
+        if entries is None:
+            with self.files_lock:
+                entries = [
+                    {
+                        "file_id": file_id,
+                        "file_name": file_info['file_name'],
+                        "file_size": file_info['file_size'],
+                        "actual_size": file_info.get('actual_size', 0),
+                        "created_at": file_info['created_at'],
+                        "file_path": file_info['file_path'],
+                        "file_ready": file_info.get('file_ready', True),
+                        "write_error": file_info.get('write_error')
+                    }
+                    for file_id, file_info in self.files.items()
+                ]
+                self._list_files_cache = entries
+        
+        # Disk presence is checked on every call, outside the lock, against one directory scan
+        files_list = [
+            {**entry, "physical_file_exists": self._physically_present(entry['file_path'], physical_names)}
+            for entry in entries
+        ]
         
         return {
             "success": True, 
             "files": files_list,
             "storage_path": self.storage_path,
-            "physical_files_count": len(physical_files)
+            "physical_files_count": len(physical_names)
         }
     
+    def _physically_present(self, file_path: str, physical_names: frozenset) -> bool:
+        """Check a file against a storage directory scan, falling back to stat outside it"""
+        directory, name = os.path.split(file_path)
+        if directory == self.storage_path:
+            return name in physical_names
+        return os.path.exists(file_path)
+    
+    def _count_physical_files(self) -> int:
+        """Count regular files in the storage directory"""
+        return len(self._physical_file_names())
+    
+    def _physical_file_names(self) -> frozenset:
+        """Names of regular files in the storage directory, rescanned only when it changes"""
+        try:
+            mtime_ns = os.stat(self.storage_path).st_mtime_ns
+            cached = self._physical_scan
+            if cached and cached[0] == mtime_ns:
+                return cached[1]
+            with os.scandir(self.storage_path) as entries:
+                names = frozenset(entry.name for entry in entries if entry.is_file())
+        except FileNotFoundError:
+            return frozenset()
+        
+        if time.time_ns() - mtime_ns > SCAN_CACHE_MIN_AGE * 1_000_000_000:
+            self._physical_scan = (mtime_ns, names)
+        return names
+    
     def _file_info(self, args: dict) -> dict:
         """Get information about a specific file"""
         file_id = args.get('file_id')
         file_name = args.get('file_name')
         
-        for fid, file_info in self.files.items():
-            if fid == file_id or file_info['file_name'] == file_name:
-                file_exists = os.path.exists(file_info['file_path'])
-                return {
-                    "success": True, 
-                    "file": file_info,
-                    "physical_file_exists": file_exists
-                }
+        if file_id not in self.files:
+            file_id = self.file_names.get(file_name)
+        
+        file_info = self.files.get(file_id)
+        if not file_info:
+            return {"success": False, "error": "File not found"}
         
-        return {"success": False, "error": "File not found"}
+        file_exists = os.path.exists(file_info['file_path'])
+        return {
+            "success": True, 
+            "file": file_info,
+            "physical_file_exists": file_exists
+        }
     
     def _storage_stats(self) -> dict:
         """Get storage statistics"""
-        total_storage = self.storage * (1024**3)  # Convert to bytes
-        used_storage = sum(file_info['file_size'] for file_info in self.files.values())
+        total_storage = self.total_storage_bytes
+        used_storage = self.used_storage_bytes
         available_storage = total_storage - used_storage
         
         # Count physical files
-        physical_files = []
-        if os.path.exists(self.storage_path):
-            physical_files = [f for f in os.listdir(self.storage_path) 
-                            if os.path.isfile(os.path.join(self.storage_path, f))]
+        physical_files_count = self._count_physical_files()
         
         return {
             "success": True,
@@ -446,7 +633,7 @@ class EnhancedStorageNode:
             "available_bytes": available_storage,
             "utilization_percent": (used_storage / total_storage) * 100,
             "files_count": len(self.files),
-            "physical_files_count": len(physical_files),
+            "physical_files_count": physical_files_count,
             "storage_path": self.storage_path
         }
     
@@ -458,9 +645,7 @@ class EnhancedStorageNode:
     
     def _get_available_storage(self) -> float:
         """Calculate available storage in bytes"""
-        total_storage = self.storage * (1024**3)
-        used_storage = sum(file_info['file_size'] for file_info in self.files.values())
-        return total_storage - used_storage
+        return self.total_storage_bytes - self.used_storage_bytes
 
 class EnhancedNodeServer:
     """Enhanced node server with network registration"""
@@ -470,14 +655,36 @@ class EnhancedNodeServer:
         self.network_host = network_host
         self.network_port = network_port
         self.registered = False
+        self.exit_requested = threading.Event()  # Set by Ctrl+C or the menu's Exit option
+        
+        # Interactive menu choice -> action
+        self.menu_actions = {
+            '1': self._display_node_status,
+            '2': self._create_file_interactive,
+            '3': self._delete_file_interactive,
+            '4': self._list_files_interactive,
+            '5': self._storage_stats_interactive,
+            '6': self._set_online_interactive,
+            '7': self._set_offline_interactive,
+            '8': self._network_status_interactive,
+            '9': self._download_file_interactive
+        }
+        
+        # Pending controller notifications, sent in coalesced batches
+        self._notify_queue = queue.Queue()
+        self._notify_thread = None
         
-    def start(self, host='localhost', port=0):
+        # Idle persistent connections to the controller, reused across RPCs
+        self._ctrl_pool = queue.LifoQueue()
+        
+    def start(self, host='localhost', port=0, listeners=1):
         """Start node and register with network"""
         # Start node server
-        actual_port = self.node.start_server(host, port)
+        actual_port = self.node.start_server(host, port, listeners)
         
         # Register with network
         self._register_with_network(actual_port)
+        self._start_notifier()
         
         # Start interactive menu in a separate thread
         menu_thread = threading.Thread(target=self._interactive_menu, daemon=True)
@@ -490,14 +697,59 @@ class EnhancedNodeServer:
         self.node.stop_server()
         if self.registered:
             self._unregister_from_network()
+        self._close_ctrl_pool()
+    
+    def _ctrl_rpc(self, command: str, args: dict, timeout: float = 10) -> dict:
+        """Send a request to the network controller over a pooled persistent connection
+
+        Each call holds its own connection, so a slow interactive request does
+        not hold up notification batches sent from the background thread.
+        """
+        request = {"command": command, "args": args}
+        while True:
+            try:
+                sock = self._ctrl_pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                sock = connect((self.network_host, self.network_port), timeout=timeout)
+                reused = False
+            
+            try:
+                sock.settimeout(timeout)
+                send_message(sock, request)
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionResetError("Network controller closed the connection")
+            except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+                sock.close()
+                if not reused:
+                    raise
+                continue  # A reused connection may have gone stale; try another
+            except Exception:
+                sock.close()
+                raise
+            
+            if self._ctrl_pool.qsize() < CTRL_POOL_SIZE:
+                self._ctrl_pool.put(sock)
+            else:
+                sock.close()
+            return response
+    
+    def _close_ctrl_pool(self):
+        """Close all idle controller connections"""
+        while True:
+            try:
+                sock = self._ctrl_pool.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                sock.close()
+            except OSError:
+                pass
     
     def _register_with_network(self, node_port: int):
         """Register node with network controller"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.network_host, self.network_port))
-            
             node_info = {
                 "node_id": self.node.node_id,
                 "cpu": self.node.cpu,
@@ -507,130 +759,90 @@ class EnhancedNodeServer:
                 "address": f"localhost:{node_port}"
             }
             
-            request = {
-                "command": "register_node",
-                "args": {
-                    "node_id": self.node.node_id,
-                    "node_info": node_info
-                }
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(4096)
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
+            response = self._ctrl_rpc("register_node", {
+                "node_id": self.node.node_id,
+                "node_info": node_info
+            })
             
             if response.get('success'):
                 self.registered = True
-                print(f"✅ Node {self.node.node_id} registered with network controller")
+                logger.info(f"✅ Node {self.node.node_id} registered with network controller")
                 return True
             else:
-                print(f"❌ Failed to register: {response}")
+                logger.error(f"❌ Failed to register: {response}")
                 return False
                 
         except Exception as e:
-            print(f"❌ Network registration error: {e}")
+            logger.error(f"❌ Network registration error: {e}")
             return False
     
     def _unregister_from_network(self):
         """Unregister node from network"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            sock.connect((self.network_host, self.network_port))
-            
-            request = {
-                "command": "unregister_node",
-                "args": {
-                    "node_id": self.node.node_id
-                }
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            sock.recv(4096)  # Wait for response
-            
-            sock.close()
+            self._ctrl_rpc("unregister_node", {"node_id": self.node.node_id}, timeout=5)
             self.registered = False
-            print(f"🔴 Node {self.node.node_id} unregistered from network")
+            logger.info(f"🔴 Node {self.node.node_id} unregistered from network")
             
         except Exception as e:
-            print(f"❌ Network unregistration error: {e}")
+            logger.error(f"❌ Network unregistration error: {e}")
 
     def _interactive_menu(self):
         """Interactive menu for node operations"""
         time.sleep(2)  # Wait for initialization
         
         while True:
-            print(f"\n🎯 NODE {self.node.node_id} - COMMAND MENU")
-            print("=" * 50)
-            print("1. 📊 Node Status")
-            print("2. 📁 Create File")
-            print("3. 🗑️  Delete File")
-            print("4. 📋 List Files")
-            print("5. 💾 Storage Stats")
-            print("6. 🟢 Set Online")
-            print("7. 🔴 Set Offline")
-            print("8. 🌐 Network Status")
-            print("9. 📥 Download File")
-            print("0. 🚪 Exit Node")
-            print("-" * 50)
+            logger.info(f"\n🎯 NODE {self.node.node_id} - COMMAND MENU")
+            logger.info("=" * 50)
+            logger.info("1. 📊 Node Status")
+            logger.info("2. 📁 Create File")
+            logger.info("3. 🗑️  Delete File")
+            logger.info("4. 📋 List Files")
+            logger.info("5. 💾 Storage Stats")
+            logger.info("6. 🟢 Set Online")
+            logger.info("7. 🔴 Set Offline")
+            logger.info("8. 🌐 Network Status")
+            logger.info("9. 📥 Download File")
+            logger.info("0. 🚪 Exit Node")
+            logger.info("-" * 50)
             
             try:
-                choice = input("Choose option (0-9): ").strip()
+                choice = _menu_input("Choose option (0-9): ").strip()
                 
-                if choice == '1':
-                    self._display_node_status()
-                elif choice == '2':
-                    self._create_file_interactive()
-                elif choice == '3':
-                    self._delete_file_interactive()
-                elif choice == '4':
-                    self._list_files_interactive()
-                elif choice == '5':
-                    self._storage_stats_interactive()
-                elif choice == '6':
-                    self._set_online_interactive()
-                elif choice == '7':
-                    self._set_offline_interactive()
-                elif choice == '8':
-                    self._network_status_interactive()
-                elif choice == '9':
-                    self._download_file_interactive()
+                action = self.menu_actions.get(choice)
+                if action:
+                    action()
                 elif choice == '0':
-                    print(f"👋 Shutting down node {self.node.node_id}...")
-                    self.stop()
+                    self.exit_requested.set()  # main() stops the node
                     break
                 else:
-                    print("❌ Invalid choice")
+                    logger.error("❌ Invalid choice")
                     
             except KeyboardInterrupt:
-                print(f"\n👋 Shutting down node {self.node.node_id}...")
-                self.stop()
+                self.exit_requested.set()
                 break
             except Exception as e:
-                print(f"❌ Error: {e}")
+                logger.error(f"❌ Error: {e}")
     
     def _display_node_status(self):
         """Display node status"""
         info = self.node._get_node_info()
         if info['success']:
-            print(f"\n🖥️  NODE {self.node.node_id} STATUS")
-            print("=" * 40)
-            print(f"Status: {'🟢 ONLINE' if self.node.status == 'online' else '🔴 OFFLINE'}")
-            print(f"CPU: {info['cpu']} vCPUs")
-            print(f"Memory: {info['memory']} GB")
-            print(f"Storage: {info['storage']} GB")
-            print(f"Bandwidth: {info['bandwidth']} Mbps")
-            print(f"Files: {info['files_count']}")
-            print(f"Port: {self.node.actual_port}")
-            print(f"Storage Path: {info['storage_path']}")
+            logger.info(f"\n🖥️  NODE {self.node.node_id} STATUS")
+            logger.info("=" * 40)
+            logger.info(f"Status: {'🟢 ONLINE' if self.node.status == 'online' else '🔴 OFFLINE'}")
+            logger.info(f"CPU: {info['cpu']} vCPUs")
+            logger.info(f"Memory: {info['memory']} GB")
+            logger.info(f"Storage: {info['storage']} GB")
+            logger.info(f"Bandwidth: {info['bandwidth']} Mbps")
+            logger.info(f"Files: {info['files_count']}")
+            logger.info(f"Port: {self.node.actual_port}")
+            logger.info(f"Storage Path: {info['storage_path']}")
     
     def _create_file_interactive(self):
         """Create file interactively"""
         try:
-            file_name = input("File name: ").strip()
-            size_mb = float(input("Size (MB): ").strip())
+            file_name = _menu_input("File name: ").strip()
+            size_mb = float(_menu_input("Size (MB): ").strip())
             
             result = self.node._create_file({
                 "file_name": file_name,
@@ -638,8 +850,8 @@ class EnhancedNodeServer:
             })
             
             if result['success']:
-                print(f"✅ File {file_name} created successfully")
-                print(f"📍 Location: {result.get('file_path')}")
+                logger.info(f"✅ File {file_name} created successfully")
+                logger.info(f"📍 Location: {result.get('file_path')}")
                 
                 # Notify network controller about the new file
                 self._notify_network_file_created(
@@ -648,38 +860,38 @@ class EnhancedNodeServer:
                     int(size_mb * 1024 * 1024)
                 )
             else:
-                print(f"❌ Failed: {result.get('error')}")
+                logger.error(f"❌ Failed: {result.get('error')}")
                 
         except Exception as e:
-            print(f"❌ Error: {e}")
+            logger.error(f"❌ Error: {e}")
     
     def _delete_file_interactive(self):
         """Delete file interactively"""
         files_result = self.node._list_files()
         if not files_result['success'] or not files_result['files']:
-            print("❌ No files available to delete")
+            logger.error("❌ No files available to delete")
             return
             
-        print("\n📂 Available files:")
+        logger.info("\n📂 Available files:")
         for i, file_info in enumerate(files_result['files']):
-            print(f"{i+1}. {file_info['file_name']} (ID: {file_info['file_id']})")
+            logger.info(f"{i+1}. {file_info['file_name']} (ID: {file_info['file_id']})")
         
         try:
-            file_idx = int(input("File number to delete: ")) - 1
+            file_idx = int(_menu_input("File number to delete: ")) - 1
             if 0 <= file_idx < len(files_result['files']):
                 file_id = files_result['files'][file_idx]['file_id']
                 file_name = files_result['files'][file_idx]['file_name']
                 result = self.node._delete_file({"file_id": file_id})
                 if result['success']:
-                    print("✅ File deleted successfully")
+                    logger.info("✅ File deleted successfully")
                     # Notify network controller about the deletion
                     self._notify_network_file_deleted(file_id, file_name)
                 else:
-                    print(f"❌ Failed: {result.get('error')}")
+                    logger.error(f"❌ Failed: {result.get('error')}")
             else:
-                print("❌ Invalid file number")
+                logger.error("❌ Invalid file number")
         except Exception as e:
-            print(f"❌ Error: {e}")
+            logger.error(f"❌ Error: {e}")
     
     def _list_files_interactive(self):
         """List files interactively"""
@@ -687,247 +899,203 @@ class EnhancedNodeServer:
         if result['success']:
             files = result['files']
             if files:
-                print(f"\n📂 FILES ON {self.node.node_id} ({len(files)} total)")
-                print("=" * 60)
+                logger.info(f"\n📂 FILES ON {self.node.node_id} ({len(files)} total)")
+                logger.info("=" * 60)
                 for file_info in files:
                     size_mb = file_info['file_size'] / (1024 * 1024)
-                    print(f"📄 {file_info['file_name']} ({size_mb:.2f}MB)")
-                    print(f"   ID: {file_info['file_id']}")
-                    print(f"   Path: {file_info['file_path']}")
-                    print(f"   Created: {time.ctime(file_info['created_at'])}")
-                    print()
+                    logger.info(f"📄 {file_info['file_name']} ({size_mb:.2f}MB)")
+                    logger.info(f"   ID: {file_info['file_id']}")
+                    logger.info(f"   Path: {file_info['file_path']}")
+                    logger.info(f"   Created: {time.ctime(file_info['created_at'])}")
+                    if file_info['write_error']:
+                        logger.error(f"   ❌ Write failed: {file_info['write_error']}")
+                    logger.info("")
             else:
-                print("📂 No files found")
+                logger.info("📂 No files found")
         else:
-            print("❌ Failed to list files")
+            logger.error("❌ Failed to list files")
     
     def _storage_stats_interactive(self):
         """Display storage stats interactively"""
         result = self.node._storage_stats()
         if result['success']:
-            print(f"\n💾 STORAGE STATS - {self.node.node_id}")
-            print("=" * 40)
+            logger.info(f"\n💾 STORAGE STATS - {self.node.node_id}")
+            logger.info("=" * 40)
             used_gb = result['used_bytes'] / (1024**3)
             total_gb = result['total_bytes'] / (1024**3)
             available_gb = result['available_bytes'] / (1024**3)
             
-            print(f"Total: {total_gb:.2f} GB")
-            print(f"Used: {used_gb:.2f} GB ({result['utilization_percent']:.1f}%)")
-            print(f"Available: {available_gb:.2f} GB")
-            print(f"Files: {result['files_count']}")
-            print(f"Physical Files: {result['physical_files_count']}")
+            logger.info(f"Total: {total_gb:.2f} GB")
+            logger.info(f"Used: {used_gb:.2f} GB ({result['utilization_percent']:.1f}%)")
+            logger.info(f"Available: {available_gb:.2f} GB")
+            logger.info(f"Files: {result['files_count']}")
+            logger.info(f"Physical Files: {result['physical_files_count']}")
         else:
-            print("❌ Failed to get storage stats")
+            logger.error("❌ Failed to get storage stats")
     
     def _set_online_interactive(self):
         """Set node online interactively"""
         result = self.node.set_online()
         if result['success']:
-            print(f"✅ {result['message']}")
+            logger.info(f"✅ {result['message']}")
             # Notify network controller about status change
             self._notify_network_status_change("online")
         else:
-            print(f"❌ Failed: {result.get('error')}")
+            logger.error(f"❌ Failed: {result.get('error')}")
     
     def _set_offline_interactive(self):
         """Set node offline interactively"""
         result = self.node.set_offline()
         if result['success']:
-            print(f"✅ {result['message']}")
+            logger.info(f"✅ {result['message']}")
             # Notify network controller about status change
             self._notify_network_status_change("offline")
         else:
-            print(f"❌ Failed: {result.get('error')}")
+            logger.error(f"❌ Failed: {result.get('error')}")
     
     def _notify_network_status_change(self, status: str):
         """Notify network controller about node status change"""
+        self._queue_notification(
+            "node_status",
+            {
+                "node_id": self.node.node_id,
+                "status": status
+            },
+            f"✅ Network controller notified: node is {status}",
+            "⚠️  Warning: Network not notified"
+        )
+    
+    def _start_notifier(self):
+        """Start the background thread that delivers queued notifications"""
+        if self._notify_thread is None:
+            self._notify_thread = threading.Thread(target=self._notification_loop, daemon=True)
+            self._notify_thread.start()
+    
+    def _queue_notification(self, command: str, args: dict, success_message: str, failure_message: str):
+        """Queue a notification for the controller; bursts are coalesced into one batch request"""
+        request = {"command": command, "args": args}
+        self._notify_queue.put((request, success_message, failure_message))
+    
+    def _notification_loop(self):
+        """Drain queued notifications and send them to the controller in batches"""
+        while True:
+            pending = [self._notify_queue.get()]
+            time.sleep(NOTIFY_COALESCE_DELAY)  # Let a burst of events accumulate
+            while len(pending) < NOTIFY_BATCH_MAX:
+                try:
+                    pending.append(self._notify_queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._send_notification_batch(pending)
+    
+    def _send_notification_batch(self, pending: list):
+        """Send a batch of notifications over a single controller connection"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.network_host, self.network_port))
-            
-            request = {
-                "command": "node_status",
-                "args": {
-                    "node_id": self.node.node_id,
-                    "status": status
-                }
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(1024)
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
+            response = self._ctrl_rpc("batch", {
+                "events": [event for event, _, _ in pending]
+            })
             
-            if response.get('success'):
-                print(f"✅ Network controller notified: node is {status}")
+            if not response.get('success'):
+                results = [response] * len(pending)
             else:
-                print(f"⚠️  Warning: Network not notified: {response.get('error')}")
+                results = response['results']
+            
+            for (_, success_message, failure_message), result in zip(pending, results):
+                if result.get('success'):
+                    logger.info(success_message)
+                else:
+                    logger.info(f"{failure_message}: {result.get('error')}")
                 
         except Exception as e:
-            print(f"⚠️  Warning: Could not notify network controller: {e}")
+            logger.warning(f"⚠️  Warning: Could not notify network controller: {e}")
     
     def _network_status_interactive(self):
         """Get network status from controller"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.network_host, self.network_port))
-            
-            request = {
-                "command": "network_stats",
-                "args": {}
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(65536)
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
+            response = self._ctrl_rpc("network_stats", {})
             
             if response.get('success'):
                 stats = response
-                print(f"\n🌐 NETWORK STATUS")
-                print("=" * 40)
-                print(f"Total Nodes: {stats['total_nodes']}")
-                print(f"Online Nodes: {stats['online_nodes']}")
-                print(f"Total Files: {stats['total_files']}")
-                print(f"Storage Used: {stats['used_storage_gb']:.2f} GB")
-                print(f"Total Storage: {stats['total_storage_gb']:.2f} GB")
+                logger.info(f"\n🌐 NETWORK STATUS")
+                logger.info("=" * 40)
+                logger.info(f"Total Nodes: {stats['total_nodes']}")
+                logger.info(f"Online Nodes: {stats['online_nodes']}")
+                logger.info(f"Total Files: {stats['total_files']}")
+                logger.info(f"Storage Used: {stats['used_storage_gb']:.2f} GB")
+                logger.info(f"Total Storage: {stats['total_storage_gb']:.2f} GB")
             else:
-                print(f"❌ Failed to get network status: {response.get('error')}")
+                logger.error(f"❌ Failed to get network status: {response.get('error')}")
                 
         except Exception as e:
-            print(f"❌ Network error: {e}")
+            logger.error(f"❌ Network error: {e}")
     
     def _notify_network_file_created(self, file_id: str, file_name: str, file_size: int):
         """Notify network controller that a file was created locally"""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.network_host, self.network_port))
-            
-            request = {
-                "command": "register_file",
-                "args": {
-                    "file_id": file_id,
-                    "file_name": file_name,
-                    "file_size": file_size,
-                    "owner_node": self.node.node_id
-                }
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(1024)
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
-            
-            if response.get('success'):
-                print(f"✅ File registered with network controller")
-            else:
-                print(f"⚠️  Warning: File not registered with network: {response.get('error')}")
-                
-        except Exception as e:
-            print(f"⚠️  Warning: Could not notify network controller: {e}")
+        self._queue_notification(
+            "register_file",
+            {
+                "file_id": file_id,
+                "file_name": file_name,
+                "file_size": file_size,
+                "owner_node": self.node.node_id
+            },
+            "✅ File registered with network controller",
+            "⚠️  Warning: File not registered with network"
+        )
     
     def _notify_network_file_deleted(self, file_id: str, file_name: str):
         """Notify network controller that a file was deleted locally"""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.network_host, self.network_port))
-            
-            request = {
-                "command": "unregister_file",
-                "args": {
-                    "file_id": file_id,
-                    "node_id": self.node.node_id
-                }
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(1024)
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
-            
-            if response.get('success'):
-                print(f"✅ File unregistered from network controller")
-            else:
-                print(f"⚠️  Warning: File not unregistered from network: {response.get('error')}")
-                
-        except Exception as e:
-            print(f"⚠️  Warning: Could not notify network controller: {e}")
+        self._queue_notification(
+            "unregister_file",
+            {
+                "file_id": file_id,
+                "node_id": self.node.node_id
+            },
+            "✅ File unregistered from network controller",
+            "⚠️  Warning: File not unregistered from network"
+        )
     
     def _download_file_interactive(self):
         """Download file from another node"""
         try:
             # First get network files
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.network_host, self.network_port))
-            
-            request = {
-                "command": "list_files",
-                "args": {}
-            }
-            
-            sock.sendall(json.dumps(request).encode('utf-8'))
-            data = sock.recv(65536)
-            response = json.loads(data.decode('utf-8'))
-            
-            sock.close()
+            response = self._ctrl_rpc("list_files", {})
             
             if not response.get('success') or not response.get('files'):
-                print("❌ No files available in network")
+                logger.error("❌ No files available in network")
                 return
             
             files = response['files']
-            print("\n📂 Available files in network:")
+            logger.info("\n📂 Available files in network:")
             for i, file_info in enumerate(files):
                 size_mb = file_info['file_size'] / (1024 * 1024)
-                print(f"{i+1}. {file_info['file_name']} ({size_mb:.2f}MB) - Available on: {', '.join(file_info['available_on'])}")
+                logger.info(f"{i+1}. {file_info['file_name']} ({size_mb:.2f}MB) - Available on: {', '.join(file_info['available_on'])}")
             
-            file_idx = int(input("File number to download: ")) - 1
+            file_idx = int(_menu_input("File number to download: ")) - 1
             if 0 <= file_idx < len(files):
                 file_info = files[file_idx]
-                source_node = input(f"Source node ({', '.join(file_info['available_on'])}): ").strip()
+                source_node = _menu_input(f"Source node ({', '.join(file_info['available_on'])}): ").strip()
                 
                 if source_node not in file_info['available_on']:
-                    print("❌ File not available on that node")
+                    logger.error("❌ File not available on that node")
                     return
                 
                 # Use controller to handle the download
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(30)
-                sock.connect((self.network_host, self.network_port))
-                
-                download_request = {
-                    "command": "download_file",
-                    "args": {
-                        "target_node": self.node.node_id,
-                        "file_name": file_info['file_name'],
-                        "source_node": source_node
-                    }
-                }
-                
-                sock.sendall(json.dumps(download_request).encode('utf-8'))
-                data = sock.recv(4096)
-                download_response = json.loads(data.decode('utf-8'))
-                
-                sock.close()
+                download_response = self._ctrl_rpc("download_file", {
+                    "target_node": self.node.node_id,
+                    "file_name": file_info['file_name'],
+                    "source_node": source_node
+                }, timeout=30)
                 
                 if download_response.get('success'):
-                    print(f"✅ {download_response.get('message')}")
+                    logger.info(f"✅ {download_response.get('message')}")
                 else:
-                    print(f"❌ Download failed: {download_response.get('error')}")
+                    logger.error(f"❌ Download failed: {download_response.get('error')}")
             else:
-                print("❌ Invalid file number")
+                logger.error("❌ Invalid file number")
                 
         except Exception as e:
-            print(f"❌ Error: {e}")
+            logger.error(f"❌ Error: {e}")
 
 def main():
     parser = argparse.ArgumentParser(description='Enhanced Storage Node Server')
@@ -939,11 +1107,21 @@ def main():
     parser.add_argument('--memory', type=int, default=16, help='Memory capacity (GB)')
     parser.add_argument('--storage', type=int, default=1000, help='Storage capacity (GB)')
     parser.add_argument('--bandwidth', type=int, default=1000, help='Bandwidth (Mbps)')
+    parser.add_argument('--msgpack', action='store_true', help='Send RPCs as MessagePack (requires msgspec on every peer)')
+    parser.add_argument('--listeners', type=int, default=1, help='Accept loops sharing the node port via SO_REUSEPORT (default: 1)')
     
     args = parser.parse_args()
+    setup_logging()
     
-    print(f"🚀 Starting Enhanced Storage Node: {args.node_id}")
-    print("=" * 50)
+    if args.msgpack and not enable_msgpack():
+        logger.warning("⚠️  msgspec is not installed; sending RPCs as JSON")
+    
+    if args.listeners > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        logger.warning("⚠️  SO_REUSEPORT is not supported here; using a single listener")
+        args.listeners = 1
+    
+    logger.info(f"🚀 Starting Enhanced Storage Node: {args.node_id}")
+    logger.info("=" * 50)
     
     # Create node
     node = EnhancedStorageNode(
@@ -957,19 +1135,18 @@ def main():
     # Create server
     server = EnhancedNodeServer(node, args.network_host, args.network_port)
     
-    try:
-        # Start server
-        server.start(args.host, 0)  # Auto-assign port
-        
-        print(f"✅ Node {args.node_id} ready with interactive menu!")
-        
-        # Keep running
-        while True:
-            time.sleep(1)
-            
-    except KeyboardInterrupt:
-        print(f"\n🛑 Stopping node {args.node_id}...")
-        server.stop()
+    signal.signal(signal.SIGINT, lambda signum, frame: server.exit_requested.set())
+    
+    # Start server
+    server.start(args.host, 0, max(1, args.listeners))  # Auto-assign port
+    
+    logger.info(f"✅ Node {args.node_id} ready with interactive menu!")
+    
+    # Sleep until Ctrl+C or the menu's Exit option
+    wait_for_exit(server.exit_requested)
+    
+    logger.info(f"\n🛑 Stopping node {args.node_id}...")
+    server.stop()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
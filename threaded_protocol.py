@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Message framing for the threaded storage network.
+
+Every message is preceded by a 4-byte big-endian length, so a connection
+can carry any number of requests and responses. The top bit of the length
+marks a MessagePack payload; without it the payload is JSON. Messages are
+sent as JSON unless a process opts in with enable_msgpack(), and servers
+answer in the format of each request, so JSON-only peers keep working.
+
+When zstandard is installed, requests also set a flag saying the sender
+accepts compressed replies, and servers zstd-compress replies larger than
+COMPRESS_THRESHOLD (list_files, network_stats) for those senders only.
+
+FrameServer is the accept and dispatch loop shared by nodes and the
+controller: idle connections wait in a selector and only connections with
+request bytes pending are handed to the worker pool.
+"""
+
+import json
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec is optional; messages are sent as JSON without it
+    msgspec = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; replies are sent uncompressed without it
+    zstandard = None
+
+HEADER = struct.Struct('>I')
+PACKED_FLAG = 0x80000000       # Payload is MessagePack rather than JSON
+COMPRESSED_FLAG = 0x40000000   # Payload is zstd-compressed
+ACCEPTS_ZSTD_FLAG = 0x20000000  # Sender can read compressed replies
+LENGTH_MASK = 0x1FFFFFFF
+
+# Flags a server carries over from a request to its reply, and every combination of them
+REPLY_FLAGS_MASK = PACKED_FLAG | ACCEPTS_ZSTD_FLAG
+REPLY_FLAGS = (0, PACKED_FLAG, ACCEPTS_ZSTD_FLAG, PACKED_FLAG | ACCEPTS_ZSTD_FLAG)
+
+# Replies larger than this are compressed for peers that accept it
+COMPRESS_THRESHOLD = 4096
+COMPRESS_LEVEL = 1
+
+# Larger lengths mean a corrupt header or an unframed (legacy JSON) peer
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Each thread receives frames into one reusable buffer; larger frames get their own
+RECV_BUFFER_SIZE = 65536
+MAX_REUSED_BUFFER = 1024 * 1024
+
+# Kernel send/receive buffer for every connection, so large replies are not window-limited
+SOCKET_BUFFER_SIZE = 1024 * 1024
+
+# A client that stops reading its replies releases the worker after this long
+SEND_TIMEOUT = 30  # seconds
+
+# Windows cannot interrupt an untimed Event.wait, so wait_for_exit() polls at this interval there
+EXIT_POLL_INTERVAL = 1 if os.name == 'nt' else None  # seconds
+
+# Keepalive timing: first probe after 60s idle, then every 10s, give up after 6
+KEEPALIVE_OPTIONS = (
+    ('TCP_KEEPIDLE', 60),
+    ('TCP_KEEPINTVL', 10),
+    ('TCP_KEEPCNT', 6),
+)
+
+if msgspec is not None:
+    _packer = msgspec.msgpack.Encoder()
+    _unpacker = msgspec.msgpack.Decoder()
+else:
+    _packer = _unpacker = None
+
+_send_packed = False  # Set by enable_msgpack()
+
+
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    def dumps(message) -> bytes:
+        """Serialize a message to UTF-8 JSON bytes"""
+        return json.dumps(message).encode('utf-8')
+
+    def loads(data):
+        """Parse UTF-8 JSON from bytes or a buffer view"""
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+_buffers = threading.local()
+_zstd = threading.local()  # Per-thread compressor/decompressor; they are not thread-safe
+
+
+def connect(address, timeout: float) -> socket.socket:
+    """Open a TCP connection for request/response traffic"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    configure_socket(sock)
+    _set_buffer_sizes(sock)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def listen(address, backlog: int, reuse_port: bool = False) -> socket.socket:
+    """Open a listening TCP socket; accepted connections inherit its buffer sizes"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    _set_buffer_sizes(sock)
+    try:
+        sock.bind(address)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def listen_group(address, backlog: int, count: int) -> list:
+    """Open count listening sockets on one port, each to be served by its own accept loop
+
+    With count > 1 every socket sets SO_REUSEPORT and the kernel balances
+    incoming connections between them. That also lets any other process of
+    the same user bind the port without error, so groups are opt-in; with
+    count 1 the socket is plain and a port conflict fails with EADDRINUSE.
+    """
+    reuse_port = count > 1
+    if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+        raise OSError("SO_REUSEPORT is not supported on this platform")
+    sockets = [listen(address, backlog, reuse_port)]
+    try:
+        port = sockets[0].getsockname()[1]
+        for _ in range(count - 1):
+            sockets.append(listen((address[0], port), backlog, reuse_port))
+    except OSError:
+        for sock in sockets:
+            sock.close()
+        raise
+    return sockets
+
+
+def _set_buffer_sizes(sock):
+    """Set the socket's buffers before it connects or listens, so the TCP window can use them"""
+    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER_SIZE)
+        except OSError:
+            pass  # Capped or refused by the system; keep its default
+
+
+def configure_socket(sock):
+    """Tune a connected socket for small frames and dead-peer detection
+
+    Nagle's algorithm is disabled so small frames go out immediately, and
+    TCP keepalive probes drop a silent peer after about two minutes instead
+    of the two-hour system default.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in KEEPALIVE_OPTIONS:
+        if hasattr(socket, option):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            except OSError:
+                pass  # Not supported on this platform
+
+
+def enable_msgpack() -> bool:
+    """Send requests as MessagePack; every peer must have msgspec installed
+
+    Returns False, leaving JSON in place, when msgspec is not available.
+    """
+    global _send_packed
+    _send_packed = _packer is not None
+    return _send_packed
+
+
+def encode_message(message: dict, packed: bool = None, compress: bool = False) -> bytes:
+    """Encode a message as a length-prefixed frame
+
+    compress is only honoured for payloads over COMPRESS_THRESHOLD, and only
+    when zstandard is installed.
+    """
+    if packed is None:
+        packed = _send_packed
+    flags = ACCEPTS_ZSTD_FLAG if zstandard is not None else 0
+    if packed and _packer is not None:
+        payload = _packer.encode(message)
+        flags |= PACKED_FLAG
+    else:
+        payload = dumps(message)
+
+    if compress and zstandard is not None and len(payload) > COMPRESS_THRESHOLD:
+        payload = _compressor().compress(payload)
+        flags |= COMPRESSED_FLAG
+    return HEADER.pack(len(payload) | flags) + payload
+
+
+def encode_reply(message: dict, reply_flags: int) -> bytes:
+    """Encode a reply in the format the request asked for"""
+    return encode_message(message, bool(reply_flags & PACKED_FLAG), bool(reply_flags & ACCEPTS_ZSTD_FLAG))
+
+
+def send_message(sock, message: dict, packed: bool = None):
+    """Send one framed message on a socket"""
+    sock.sendall(encode_message(message, packed))
+
+
+def recv_message(sock):
+    """Receive one framed message from a socket, or None if the peer closed the connection"""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+
+    (word,) = HEADER.unpack(header)
+    payload = _recv_exact(sock, _frame_length(word))
+    if payload is None:
+        raise ConnectionError("Connection closed in the middle of a message")
+    return _decode(payload, word)
+
+
+def wait_for_exit(exit_requested: threading.Event):
+    """Block the main thread until exit_requested is set, staying interruptible on Windows"""
+    while not exit_requested.wait(EXIT_POLL_INTERVAL):
+        pass
+
+
+class FrameServer:
+    """Serve framed requests from listening sockets on a bounded worker pool
+
+    Each listening socket gets a selector thread that accepts connections
+    and watches them while they are idle. A connection is handed to a
+    worker only once request bytes arrive; the worker answers every complete
+    frame received and hands the connection back. Idle keep-alive peers
+    therefore hold a file descriptor, never a worker.
+
+    respond(request, reply_flags) returns the encoded reply frame for one
+    request. log is called with a message for client and accept errors.
+    """
+
+    def __init__(self, respond, max_workers: int, name: str, log=print):
+        self.respond = respond
+        self.log = log
+        self.name = name
+        self.running = False
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._loops = []
+        self._threads = []
+        self._connections = set()  # Open client sockets, shut down by stop
+        self._connections_lock = threading.Lock()
+
+    def start(self, listen_sockets):
+        """Serve each listening socket from its own selector thread"""
+        self.running = True
+        for listen_socket in listen_sockets:
+            loop = _ServeLoop(self, listen_socket)
+            thread = threading.Thread(target=loop.run, name=f"{self.name}-accept", daemon=True)
+            self._loops.append(loop)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        """Close the listeners and every client connection, then wind down the pool"""
+        self.running = False
+        for loop in self._loops:
+            loop.wake()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        
+        # Unblock workers still answering so the pool can wind down
+        with self._connections_lock:
+            for client_socket in self._connections:
+                try:
+                    client_socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _track(self, client_socket):
+        """Record an accepted connection so stop can shut it down"""
+        with self._connections_lock:
+            self._connections.add(client_socket)
+
+    def _close(self, client_socket):
+        """Forget and close a client connection"""
+        with self._connections_lock:
+            self._connections.discard(client_socket)
+        client_socket.close()
+
+    def _serve(self, connection) -> bool:
+        """Answer the complete requests pending on a readable connection
+
+        Returns False once the connection should be closed.
+        """
+        try:
+            data = connection.sock.recv(RECV_BUFFER_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        connection.buffer += data
+        
+        try:
+            replies = [self.respond(request, reply_flags) for request, reply_flags in _take_frames(connection.buffer)]
+            if replies:
+                connection.sock.sendall(b''.join(replies))
+        except OSError:
+            return False
+        except Exception as e:
+            self.log(f"❌ Client error from {connection.address}: {e}")
+            return False
+        return True
+
+
+class _Connection:
+    """An accepted client socket and the bytes of any partial frame received on it"""
+    __slots__ = ('sock', 'address', 'buffer')
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()
+
+
+class _ServeLoop:
+    """Selector thread for one listening socket and the idle connections it accepted"""
+
+    def __init__(self, server: FrameServer, listen_socket):
+        self.server = server
+        self.listen_socket = listen_socket
+        self.selector = selectors.DefaultSelector()
+        self._returned = queue.SimpleQueue()  # Connections handed back by workers
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        listen_socket.setblocking(False)
+        self.selector.register(listen_socket, selectors.EVENT_READ, self._accept)
+        self.selector.register(self._wake_recv, selectors.EVENT_READ, self._take_returned)
+
+    def run(self):
+        """Accept connections and dispatch readable ones until the server stops"""
+        try:
+            while self.server.running:
+                for key, _ in self.selector.select():
+                    if isinstance(key.data, _Connection):
+                        self._dispatch(key.data)
+                    else:
+                        key.data(key.fileobj)
+        except Exception as e:
+            if self.server.running:
+                self.server.log(f"❌ {self.server.name} serve loop failed: {e}")
+        finally:
+            for key in list(self.selector.get_map().values()):
+                if isinstance(key.data, _Connection):
+                    self.server._close(key.fileobj)
+            self.selector.close()
+            self.listen_socket.close()
+            self._wake_recv.close()
+            self._wake_send.close()
+
+    def wake(self):
+        """Interrupt select() so the loop sees returned connections or a stop"""
+        try:
+            self._wake_send.send(b'\0')
+        except OSError:
+            pass  # A wakeup is already pending, or the loop has exited
+
+    def _accept(self, listen_socket):
+        """Accept every pending connection and start watching it"""
+        while True:
+            try:
+                client_socket, address = listen_socket.accept()
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if self.server.running:
+                    self.server.log(f"⚠️  {self.server.name} accept failed: {e}")
+                    time.sleep(0.1)  # Back off from persistent errors such as EMFILE
+                return
+            
+            try:
+                configure_socket(client_socket)
+                client_socket.settimeout(SEND_TIMEOUT)
+            except OSError:
+                client_socket.close()  # Peer already gone
+                continue
+            self.server._track(client_socket)
+            connection = _Connection(client_socket, address[0])
+            self.selector.register(client_socket, selectors.EVENT_READ, connection)
+
+    def _dispatch(self, connection: _Connection):
+        """Hand a readable connection to a worker; it is not watched while being served"""
+        self.selector.unregister(connection.sock)
+        try:
+            self.server._pool.submit(self._serve, connection)
+        except RuntimeError:
+            self.server._close(connection.sock)  # Pool shut down by stop
+
+    def _serve(self, connection: _Connection):
+        """Worker task: answer the connection, then return it to this loop or close it"""
+        if self.server._serve(connection) and self.server.running:
+            self._returned.put(connection)
+            self.wake()
+        else:
+            self.server._close(connection.sock)
+
+    def _take_returned(self, wake_socket):
+        """Drain wakeups and resume watching connections workers have finished with"""
+        try:
+            while wake_socket.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while True:
+            try:
+                connection = self._returned.get_nowait()
+            except queue.Empty:
+                return
+            self.selector.register(connection.sock, selectors.EVENT_READ, connection)
+
+
+def _take_frames(buffer: bytearray):
+    """Remove each complete frame from the front of buffer, yielding (message, reply flags)"""
+    while len(buffer) >= HEADER.size:
+        (word,) = HEADER.unpack_from(buffer)
+        end = HEADER.size + _frame_length(word)
+        if len(buffer) < end:
+            return
+        with memoryview(buffer) as view, view[HEADER.size:end] as payload:
+            message = _decode(payload, word)
+        del buffer[:end]
+        yield message, word & REPLY_FLAGS_MASK
+
+
+def _frame_length(word: int) -> int:
+    """Extract the payload length from a header word, rejecting oversized frames"""
+    length = word & LENGTH_MASK
+    if length > MAX_FRAME_SIZE:
+        raise ConnectionError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return length
+
+
+def _decode(payload: bytes, word: int) -> dict:
+    """Decode a frame payload in the format marked by its header word"""
+    if word & COMPRESSED_FLAG:
+        if zstandard is None:
+            raise ValueError("Received a compressed frame but zstandard is not installed")
+        payload = _decompressor().decompress(payload)
+    if word & PACKED_FLAG:
+        if _unpacker is None:
+            raise ValueError("Received a MessagePack frame but msgspec is not installed")
+        return _unpacker.decode(payload)
+    return loads(payload)
+
+
+def _compressor():
+    """Return this thread's zstd compressor"""
+    compressor = getattr(_zstd, 'compressor', None)
+    if compressor is None:
+        compressor = _zstd.compressor = zstandard.ZstdCompressor(level=COMPRESS_LEVEL)
+    return compressor
+
+
+def _decompressor():
+    """Return this thread's zstd decompressor"""
+    decompressor = getattr(_zstd, 'decompressor', None)
+    if decompressor is None:
+        decompressor = _zstd.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def _recv_buffer(size: int) -> memoryview:
+    """Return a writable view of size bytes, reusing this thread's buffer when it fits
+
+    The view is only valid until the thread's next receive, so it must be
+    decoded before then.
+    """
+    if size > MAX_REUSED_BUFFER:
+        return memoryview(bytearray(size))
+    buffer = getattr(_buffers, 'data', None)
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(max(size, RECV_BUFFER_SIZE))
+        _buffers.data = buffer
+    return memoryview(buffer)[:size]
+
+
+def _recv_exact(sock, size: int):
+    """Read exactly size bytes from a socket, or None if it closes before the first byte"""
+    view = _recv_buffer(size)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            if received:
+                raise ConnectionError("Connection closed in the middle of a message")
+            return None
+        received += count
+    return view